@@ -1,12 +1,13 @@
 """Main Discord bot for AO3 RSS Tracker."""
 import discord
+import aiohttp
 from discord.ext import commands, tasks
 import logging
 import asyncio
-import re
-from datetime import datetime
-from typing import List, Dict, Set
-from html import unescape
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import List, Dict, Set, Tuple, Optional
+from html.parser import HTMLParser
 
 from config import config
 from database import db
@@ -19,6 +20,81 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class SummaryTextExtractor(HTMLParser):
+    """Single-pass collector of the summary paragraphs in an AO3 entry's HTML.
+    
+    Paragraphs up to and including the author line are dropped, and collection
+    stops at the word count paragraph. If there is no word count paragraph, the
+    metadata <ul> marks the end of the summary instead.
+    """
+    
+    def __init__(self):
+        super().__init__()  # convert_charrefs=True decodes entities for us
+        self.paragraphs: List[str] = []
+        self._current: Optional[List[str]] = None
+        self._current_has_author_link = False
+        self._ul_index: Optional[int] = None
+        self._done = False
+    
+    def handle_starttag(self, tag, attrs):
+        if self._done:
+            return
+        if tag == "p":
+            self._current = []
+            self._current_has_author_link = False
+        elif tag == "a" and self._current is not None and ("rel", "author") in attrs:
+            self._current_has_author_link = True
+        elif tag == "ul" and self._ul_index is None:
+            self._ul_index = len(self.paragraphs)
+    
+    def handle_endtag(self, tag):
+        if self._done or tag != "p" or self._current is None:
+            return
+        raw_text = "".join(self._current)
+        self._current = None
+        
+        if raw_text.lstrip().lower().startswith("words:"):
+            # Everything from the word count line onward is metadata
+            self._done = True
+            self._ul_index = None
+            return
+        
+        if self._current_has_author_link and raw_text.lstrip().startswith("by"):
+            # The summary starts after the author paragraph
+            self.paragraphs.clear()
+            self._ul_index = None
+            return
+        
+        # Clean whitespace
+        text = " ".join(raw_text.split())
+        if text:
+            self.paragraphs.append(text)
+    
+    def handle_data(self, data):
+        if not self._done and self._current is not None:
+            self._current.append(data)
+    
+    def get_paragraphs(self) -> List[str]:
+        """Return the collected summary paragraphs."""
+        if self._ul_index is not None:
+            return self.paragraphs[:self._ul_index]
+        return self.paragraphs
+
+
+def truncated_join(items: List[str], limit: int) -> str:
+    """Join up to `limit` items with commas, noting how many were left out."""
+    text = ", ".join(islice(items, limit))
+    if len(items) > limit:
+        text += f" (+{len(items) - limit} more)"
+    return text
+
+
+# How long an unchanged feed can go without its last_updated timestamp being rewritten
+FEED_METADATA_REFRESH = timedelta(hours=6)
+
+# How long a channel's send worker waits for more work before shutting down
+CHANNEL_WORKER_IDLE_SECONDS = 60
+
 
 class AO3TrackerBot(commands.Bot):
     """Discord bot for tracking AO3 RSS feeds."""
@@ -34,6 +110,14 @@ class AO3TrackerBot(commands.Bot):
             intents=intents,
             help_command=None  # Disable default help command
         )
+        
+        # Shared HTTP session for feed fetching (created in setup_hook)
+        self.http_session: Optional[aiohttp.ClientSession] = None
+        
+        # Per-channel send queues, each drained by a single worker task so sends
+        # to one channel stay in order; idle workers exit and drop their entries
+        self._channel_queues: Dict[int, asyncio.Queue] = {}
+        self._channel_workers: Dict[int, asyncio.Task] = {}
     
     async def setup_hook(self):
         """Called when the bot is starting up."""
@@ -42,6 +126,18 @@ class AO3TrackerBot(commands.Bot):
         # Connect to database
         await db.connect()
         
+        # Create a single HTTP session so keep-alive connections (and DNS lookups) to AO3 are reused
+        self.http_session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=config.FEED_FETCH_TIMEOUT),
+            connector=aiohttp.TCPConnector(
+                limit=20,
+                limit_per_host=5,
+                keepalive_timeout=75,
+                ttl_dns_cache=300
+            )
+        )
+        feed_parser.session = self.http_session
+        
         # Load command cogs
         await self.load_extension("commands.track")
         await self.load_extension("commands.untrack")
@@ -60,6 +156,10 @@ class AO3TrackerBot(commands.Bot):
         # Start polling task
         self.poll_feeds.start()
         logger.info("Feed polling task started")
+        
+        # Keep notified_entries (and its indexes) small by dropping old records daily
+        if config.NOTIFIED_ENTRY_RETENTION_DAYS:
+            self.prune_notified_entries.start()
     
     async def on_ready(self):
         """Called when the bot is ready."""
@@ -70,6 +170,11 @@ class AO3TrackerBot(commands.Bot):
         """Called when the bot is shutting down."""
         logger.info("Shutting down bot...")
         self.poll_feeds.cancel()
+        self.prune_notified_entries.cancel()
+        for worker in list(self._channel_workers.values()):
+            worker.cancel()
+        if self.http_session:
+            await self.http_session.close()
         await db.close()
         await super().close()
     
@@ -131,21 +236,15 @@ class AO3TrackerBot(commands.Bot):
         
         # Add tags (truncate if too long)
         if entry.get("relationships"):
-            relationships = ", ".join(entry["relationships"][:5])
-            if len(entry["relationships"]) > 5:
-                relationships += f" (+{len(entry['relationships']) - 5} more)"
+            relationships = truncated_join(entry["relationships"], 5)
             embed.add_field(name="Relationships", value=relationships[:1024], inline=False)
         
         if entry.get("characters"):
-            characters = ", ".join(entry["characters"][:5])
-            if len(entry["characters"]) > 5:
-                characters += f" (+{len(entry['characters']) - 5} more)"
+            characters = truncated_join(entry["characters"], 5)
             embed.add_field(name="Characters", value=characters[:1024], inline=False)
         
         if entry.get("additional_tags"):
-            tags = ", ".join(entry["additional_tags"][:10])
-            if len(entry["additional_tags"]) > 10:
-                tags += f" (+{len(entry['additional_tags']) - 10} more)"
+            tags = truncated_join(entry["additional_tags"], 10)
             embed.add_field(name="Tags", value=tags[:1024], inline=False)
         
         # Add warnings if present
@@ -166,62 +265,79 @@ class AO3TrackerBot(commands.Bot):
         if not html_content:
             return ""
         
-        # Find the author paragraph and skip it
-        # Pattern: <p>by <a href="..." rel="author">Author</a></p>
-        author_end = re.search(r'<p>by\s+<a[^>]*rel="author"[^>]*>[^<]+</a></p>', html_content)
-        if author_end:
-            # Start after the author paragraph
-            html_content = html_content[author_end.end():]
-        
-        # Find where word count/chapters line starts (before <ul>)
-        # Look for pattern like: <p>Words: X, Chapters: Y/Z, Language: Z</p>
-        word_count_match = re.search(r'<p>Words:', html_content, re.IGNORECASE)
-        if word_count_match:
-            # Extract only content before word count line
-            html_content = html_content[:word_count_match.start()]
-        
-        # If no word count line, look for <ul> (metadata list)
-        if not word_count_match:
-            ul_match = re.search(r'<ul', html_content, re.IGNORECASE)
-            if ul_match:
-                html_content = html_content[:ul_match.start()]
-        
-        # Extract text from all <p> tags (summary paragraphs)
-        paragraphs = re.findall(r'<p>(.*?)</p>', html_content, re.DOTALL)
-        
-        # Clean each paragraph: remove HTML tags, decode entities
-        cleaned_paragraphs = []
-        for para in paragraphs:
-            # Remove HTML tags
-            para_text = re.sub(r'<[^>]+>', '', para)
-            # Decode HTML entities
-            para_text = unescape(para_text)
-            # Clean whitespace
-            para_text = re.sub(r'\s+', ' ', para_text).strip()
-            if para_text:
-                cleaned_paragraphs.append(para_text)
+        extractor = SummaryTextExtractor()
+        extractor.feed(html_content)
+        extractor.close()
         
         # Join paragraphs with double newlines
-        text = '\n\n'.join(cleaned_paragraphs)
+        return '\n\n'.join(extractor.get_paragraphs())
+    
+    def _get_channel_queue(self, channel_id: int) -> asyncio.Queue:
+        """Get the send queue for a channel, starting its worker on first use."""
+        queue = self._channel_queues.get(channel_id)
+        if queue is None:
+            queue = asyncio.Queue()
+            self._channel_queues[channel_id] = queue
+            self._channel_workers[channel_id] = asyncio.create_task(
+                self._channel_worker(channel_id, queue)
+            )
+        return queue
+    
+    async def _channel_worker(self, channel_id: int, queue: asyncio.Queue):
+        """Send queued embeds to a channel one at a time (discord.py handles rate limits).
         
-        return text
+        Exits once the queue has been idle for CHANNEL_WORKER_IDLE_SECONDS.
+        """
+        while True:
+            try:
+                channel, embed, future = await asyncio.wait_for(queue.get(), CHANNEL_WORKER_IDLE_SECONDS)
+            except asyncio.TimeoutError:
+                # Nothing can be queued between this check and the pops (no await in between)
+                if queue.empty():
+                    self._channel_queues.pop(channel_id, None)
+                    self._channel_workers.pop(channel_id, None)
+                    return
+                continue
+            try:
+                await channel.send(embed=embed)
+                if not future.done():
+                    future.set_result(True)
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                queue.task_done()
     
-    async def send_entry_notification(self, entry: Dict, channel_id: int):
-        """Send a notification for an entry to a channel."""
-        try:
+    def _resolve_sendable_channels(self, channel_ids: Set[int]) -> Dict[int, discord.abc.Messageable]:
+        """Look up channels once per polling cycle, keeping only those the bot can send to."""
+        channels = {}
+        for channel_id in channel_ids:
             channel = self.get_channel(channel_id)
             if not channel:
                 logger.warning(f"Channel {channel_id} not found")
-                return False
+                continue
             
             # Check permissions
             if not channel.permissions_for(channel.guild.me).send_messages:
                 logger.warning(f"No permission to send messages in channel {channel_id}")
-                return False
+                continue
             
-            embed = self.create_entry_embed(entry)
-            await channel.send(embed=embed)
-            logger.info(f"Sent notification for entry {entry['id']} to channel {channel_id}")
+            channels[channel_id] = channel
+        return channels
+    
+    async def send_entry_notification(self, entry_id: str, embed: discord.Embed, channel: discord.abc.Messageable):
+        """Send a prebuilt entry embed to an already resolved channel."""
+        channel_id = channel.id
+        try:
+            # Hand the send to the channel's worker and wait for the outcome
+            future = asyncio.get_running_loop().create_future()
+            self._get_channel_queue(channel_id).put_nowait((channel, embed, future))
+            await future
+            logger.info(f"Sent notification for entry {entry_id} to channel {channel_id}")
             return True
         
         except discord.Forbidden:
@@ -231,118 +347,236 @@ class AO3TrackerBot(commands.Bot):
             logger.error(f"Error sending notification to channel {channel_id}: {e}", exc_info=True)
             return False
     
+    async def _notify_subscription(
+        self,
+        subscription: Dict,
+        channel: discord.abc.Messageable,
+        new_entries: List[Dict],
+        embeds: Dict[str, discord.Embed],
+        already_notified: Set[Tuple[int, str]],
+        sent_pairs: List[Tuple[int, str]]
+    ):
+        """Send new (non-excluded, not yet notified) entries to a subscription's channel.
+        
+        Each entry carries its lowercased tag names (`tag_names_lower`), computed
+        once when parsed, so each subscription only pays for a set-disjointness check.
+        `already_notified` holds the feed's (subscription_id, entry_id) pairs sent in
+        earlier cycles; pairs sent now are appended to `sent_pairs` for the caller to record.
+        """
+        subscription_id = subscription["subscription_id"]
+        
+        # Excluded tag names come from the database already lowercased
+        excluded_tag_names = subscription["excluded_tags"]
+        
+        # Filter entries by excluded tag names (case-insensitive) and earlier notifications
+        filtered_entries = [
+            entry for entry in new_entries
+            if entry["tag_names_lower"].isdisjoint(excluded_tag_names)
+            and (subscription_id, entry["id"]) not in already_notified
+        ]
+        
+        if not filtered_entries:
+            return
+        
+        # The channel's send queue keeps messages ordered while other channels send in parallel
+        for entry in filtered_entries:
+            entry_id = entry["id"]
+            
+            # Send notification
+            if await self.send_entry_notification(entry_id, embeds[entry_id], channel):
+                sent_pairs.append((subscription_id, entry_id))
+    
+    async def _process_single_feed(
+        self,
+        feed: Dict,
+        sem: asyncio.Semaphore,
+        channels: Dict[int, discord.abc.Messageable],
+        cycle_now: datetime
+    ):
+        """Fetch a single feed and notify its subscribed channels of new entries.
+        
+        `channels` maps channel ids to channels resolved for this polling cycle;
+        subscriptions whose channel is missing from it are skipped. `cycle_now` is
+        the cycle's start time, recorded as the feed's last_updated.
+        """
+        async with sem:
+            feed_id = feed["id"]
+            tag_id = feed["tag_id"]
+            last_entry_id = feed.get("last_entry_id")
+            
+            # Construct feed URL from tag_id
+            feed_url = feed_parser.construct_feed_url(tag_id)
+            
+            logger.info(f"Fetching feed: {feed_url} (tag_id: {tag_id})")
+            
+            # Fetch and parse feed (conditional on the validators from the last fetch)
+            feed_data = await feed_parser.fetch_and_parse(
+                feed_url,
+                etag=feed.get("etag"),
+                last_modified=feed.get("last_modified")
+            )
+            if not feed_data:
+                logger.warning(f"Failed to fetch feed: {feed_url}")
+                return
+            
+            if feed_data.get("not_modified"):
+                logger.info(f"Feed not modified since last poll: {feed_url}")
+                
+                # Nothing changed, but keep the stored poll time from going stale
+                last_updated = feed.get("last_updated")
+                if not last_updated or cycle_now - last_updated >= FEED_METADATA_REFRESH:
+                    await db.update_feed_metadata(
+                        feed_id,
+                        cycle_now,
+                        last_entry_id,
+                        feed.get("etag"),
+                        feed.get("last_modified")
+                    )
+                return
+            
+            etag = feed_data.get("etag")
+            last_modified = feed_data.get("last_modified")
+            
+            entries = feed_data["entries"]
+            if not entries:
+                logger.info(f"No entries found in feed: {feed_url}")
+                return
+            
+            # Find the most recent entry in a single pass
+            def entry_date(entry: Dict) -> datetime:
+                return entry.get("updated") or entry.get("published") or datetime.min
+            
+            latest_entry_id = max(entries, key=entry_date)["id"]
+            
+            if latest_entry_id == last_entry_id:
+                # Newest entry was already seen, so nothing is new and no sort is needed
+                new_entries = []
+            else:
+                # Sort entries by updated date (newest first) and get new entries
+                entries = sorted(entries, key=entry_date, reverse=True)
+                new_entries = feed_parser.get_new_entries(entries, last_entry_id)
+            
+            if not new_entries:
+                logger.info(f"No new entries in feed: {feed_url}")
+                
+                # Skip the write when nothing changed and the stored poll time is still recent
+                last_updated = feed.get("last_updated")
+                unchanged = (
+                    latest_entry_id == last_entry_id
+                    and etag == feed.get("etag")
+                    and last_modified == feed.get("last_modified")
+                )
+                if unchanged and last_updated and cycle_now - last_updated < FEED_METADATA_REFRESH:
+                    return
+                
+                # Update last_entry_id to the most recent entry even if no new ones
+                await db.update_feed_metadata(
+                    feed_id,
+                    cycle_now,
+                    latest_entry_id,
+                    etag,
+                    last_modified
+                )
+                return
+            
+            logger.info(f"Found {len(new_entries)} new entry/entries in feed: {feed_url}")
+            
+            # Subscriptions (with excluded tags) were loaded together with the feed
+            subscriptions = feed["subscriptions"]
+            
+            if not subscriptions:
+                logger.info(f"No subscriptions for feed: {feed_url}")
+                # Still update metadata
+                await db.update_feed_metadata(
+                    feed_id,
+                    cycle_now,
+                    latest_entry_id,
+                    etag,
+                    last_modified
+                )
+                return
+            
+            # Build each embed once and share it across all subscriptions
+            embeds = {entry["id"]: self.create_entry_embed(entry) for entry in new_entries}
+            
+            # Only subscriptions whose channel we can currently send to get notified
+            sendable = [
+                (subscription, channels[subscription["channel_id"]])
+                for subscription in subscriptions
+                if subscription["channel_id"] in channels
+            ]
+            
+            # Check which entries were already notified, for every subscription in one query
+            already_notified = await db.get_notified_pairs(
+                [subscription["subscription_id"] for subscription, _ in sendable],
+                list(embeds)
+            )
+            
+            # Notify subscriptions concurrently (sends to the same channel stay serialized)
+            sent_pairs = []
+            try:
+                results = await asyncio.gather(
+                    *(
+                        self._notify_subscription(
+                            subscription, channel, new_entries, embeds, already_notified, sent_pairs
+                        )
+                        for subscription, channel in sendable
+                    ),
+                    return_exceptions=True
+                )
+            finally:
+                # Record everything that was sent in one statement, even if polling was cancelled
+                await db.record_notification_pairs(sent_pairs)
+            for (subscription, _), result in zip(sendable, results):
+                if isinstance(result, Exception):
+                    logger.error(
+                        f"Error notifying subscription {subscription['subscription_id']}: {result}",
+                        exc_info=result
+                    )
+            
+            # Update feed metadata
+            await db.update_feed_metadata(
+                feed_id,
+                cycle_now,
+                latest_entry_id,
+                etag,
+                last_modified
+            )
+    
     @tasks.loop(seconds=config.POLLING_INTERVAL)
     async def poll_feeds(self):
         """Background task to poll all feeds for updates."""
         logger.info("Starting feed polling cycle...")
         
+        # One timestamp for the whole cycle, shared by every feed polled in it
+        cycle_now = datetime.utcnow()
+        
         try:
-            # Get all unique feeds
-            feeds = await db.get_all_feeds()
+            # Idle connections have expired since the last cycle; reopen them together
+            await db.warm_up()
+            
+            # Get all unique feeds along with their subscriptions in one query
+            feeds = await db.get_all_feeds_with_subscriptions()
             logger.info(f"Polling {len(feeds)} unique feed(s)")
             
-            for feed in feeds:
-                try:
-                    feed_id = feed["id"]
-                    tag_id = feed["tag_id"]
-                    last_entry_id = feed.get("last_entry_id")
-                    
-                    # Construct feed URL from tag_id
-                    feed_url = feed_parser.construct_feed_url(tag_id)
-                    
-                    logger.info(f"Fetching feed: {feed_url} (tag_id: {tag_id})")
-                    
-                    # Fetch and parse feed
-                    feed_data = await feed_parser.fetch_and_parse(feed_url)
-                    if not feed_data:
-                        logger.warning(f"Failed to fetch feed: {feed_url}")
-                        continue
-                    
-                    entries = feed_data["entries"]
-                    if not entries:
-                        logger.info(f"No entries found in feed: {feed_url}")
-                        continue
-                    
-                    # Sort entries by updated date (newest first)
-                    entries = sorted(
-                        entries,
-                        key=lambda x: x.get("updated") or x.get("published") or datetime.min,
-                        reverse=True
+            # Resolve every subscribed channel (and our permission to send there) once per cycle
+            channels = self._resolve_sendable_channels({
+                subscription["channel_id"]
+                for feed in feeds
+                for subscription in feed["subscriptions"]
+            })
+            
+            # Process feeds concurrently, bounded by the semaphore to avoid hammering AO3
+            sem = asyncio.Semaphore(config.FEED_POLL_CONCURRENCY)
+            tasks = [self._process_single_feed(feed, sem, channels, cycle_now) for feed in feeds]
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            
+            for feed, result in zip(feeds, results):
+                if isinstance(result, Exception):
+                    logger.error(
+                        f"Error processing feed {feed.get('tag_id', 'unknown')}: {result}",
+                        exc_info=result
                     )
-                    
-                    # Get new entries
-                    new_entries = feed_parser.get_new_entries(entries, last_entry_id)
-                    
-                    if not new_entries:
-                        logger.info(f"No new entries in feed: {feed_url}")
-                        # Update last_entry_id to the most recent entry even if no new ones
-                        if entries:
-                            await db.update_feed_metadata(
-                                feed_id,
-                                datetime.utcnow(),
-                                entries[0]["id"]
-                            )
-                        continue
-                    
-                    logger.info(f"Found {len(new_entries)} new entry/entries in feed: {feed_url}")
-                    
-                    # Get all subscriptions for this feed with excluded tags
-                    subscriptions = await db.get_subscriptions_with_excluded_tags(feed_id)
-                    
-                    if not subscriptions:
-                        logger.info(f"No subscriptions for feed: {feed_url}")
-                        # Still update metadata
-                        if entries:
-                            await db.update_feed_metadata(
-                                feed_id,
-                                datetime.utcnow(),
-                                entries[0]["id"]
-                            )
-                        continue
-                    
-                    # Process each subscription
-                    for subscription in subscriptions:
-                        subscription_id = subscription["subscription_id"]
-                        channel_id = subscription["channel_id"]
-                        
-                        # Get excluded tag names for this subscription (now using tag_name, not tag_url)
-                        excluded_tag_names = set(subscription.get("excluded_tags", []))
-                        
-                        # Filter entries by excluded tag names (case-insensitive)
-                        filtered_entries = feed_parser.filter_entries_by_tags(
-                            new_entries,
-                            excluded_tag_names
-                        )
-                        
-                        # Send notifications for filtered entries
-                        for entry in filtered_entries:
-                            entry_id = entry["id"]
-                            
-                            # Check if already notified
-                            if await db.is_entry_notified(subscription_id, entry_id):
-                                continue
-                            
-                            # Send notification
-                            success = await self.send_entry_notification(entry, channel_id)
-                            
-                            if success:
-                                # Record notification
-                                await db.record_notification(subscription_id, entry_id)
-                    
-                    # Update feed metadata
-                    if entries:
-                        await db.update_feed_metadata(
-                            feed_id,
-                            datetime.utcnow(),
-                            entries[0]["id"]
-                        )
-                    
-                    # Small delay between feeds to avoid rate limiting
-                    await asyncio.sleep(2)
-                
-                except Exception as e:
-                    logger.error(f"Error processing feed {feed.get('tag_id', 'unknown')}: {e}", exc_info=True)
-                    continue
             
             logger.info("Feed polling cycle completed")
         
@@ -354,10 +588,31 @@ class AO3TrackerBot(commands.Bot):
         """Wait until bot is ready before starting polling."""
         await self.wait_until_ready()
         logger.info("Bot is ready, starting feed polling...")
+    
+    @tasks.loop(hours=24)
+    async def prune_notified_entries(self):
+        """Background task to delete notification records past the retention period."""
+        try:
+            await db.prune_notified(config.NOTIFIED_ENTRY_RETENTION_DAYS)
+        except Exception as e:
+            logger.error(f"Error pruning notified entries: {e}", exc_info=True)
+    
+    @prune_notified_entries.before_loop
+    async def before_prune_notified_entries(self):
+        """Wait until bot is ready before pruning."""
+        await self.wait_until_ready()
 
 
 def main():
     """Main entry point for the bot."""
+    # Use uvloop's faster event loop when it is installed
+    try:
+        import uvloop
+        uvloop.install()
+        logger.info("Using uvloop event loop")
+    except ImportError:
+        pass
+    
     bot = AO3TrackerBot()
     
     try:
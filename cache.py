@@ -0,0 +1,46 @@
+"""In-process caching helpers for AO3 Discord RSS Tracker Bot."""
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries expire after a fixed time-to-live.
+
+    Not thread-safe; intended for use from the bot's event loop, where get/set
+    never interleave because they don't await.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a cached value, or `default` if it is missing or expired."""
+        item = self._data.get(key)
+        if item is None:
+            return default
+
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        """Cache a value, evicting the least recently used entry if full."""
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        """Drop a cached value if present."""
+        self._data.pop(key, None)
+
+    def clear(self):
+        """Drop all cached values."""
+        self._data.clear()
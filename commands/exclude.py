@@ -4,14 +4,23 @@ from discord import app_commands
 from discord.ext import commands
 import logging
 import re
+from typing import Tuple
 from urllib.parse import unquote
 from database import db
+from commands.list import invalidate_list_cache
 
 logger = logging.getLogger(__name__)
 
 # Pattern to extract tag name from URL
 TAG_URL_PATTERN = re.compile(r'https?://archiveofourown\.org/tags/([^/]+)')
 
+# Reply for subscriptions that don't exist or belong to another server
+SUBSCRIPTION_NOT_FOUND_MESSAGE = "❌ Subscription ID {subscription_id} not found in this server."
+
+# Longest tag name accepted for exclusions
+MAX_TAG_NAME_LENGTH = 500
+INVALID_TAG_NAME_MESSAGE = f"❌ Tag name must be between 1 and {MAX_TAG_NAME_LENGTH} characters."
+
 
 def extract_tag_name_from_url(tag_url: str) -> str:
     """Extract and clean tag name from URL.
@@ -21,14 +30,70 @@ def extract_tag_name_from_url(tag_url: str) -> str:
     - https://archiveofourown.org/tags/TagName/works (removes /works)
     - URL-encoded tag names
     """
-    # Try to extract from URL
-    match = TAG_URL_PATTERN.match(tag_url.strip())
-    if match:
-        tag_name = unquote(match.group(1))
-        return tag_name
+    tag_url = tag_url.strip()
+    
+    # Only run the regex on input that looks like a URL
+    if tag_url.startswith(("http://", "https://")):
+        match = TAG_URL_PATTERN.match(tag_url)
+        if match:
+            tag_name = match.group(1)
+            # Only percent-encoded names need decoding
+            return unquote(tag_name) if "%" in tag_name else tag_name
     
     # If no match, assume it's already a tag name
-    return tag_url.strip()
+    return tag_url
+
+
+async def _do_exclude(subscription_id: int, guild_id: int, tag_url: str, user_id: int) -> Tuple[str, bool]:
+    """Add a tag exclusion, returning the reply text and whether it should be ephemeral."""
+    # Extract and validate the tag name before touching the database
+    tag_name = extract_tag_name_from_url(tag_url)
+    if not tag_name or len(tag_name) > MAX_TAG_NAME_LENGTH:
+        return INVALID_TAG_NAME_MESSAGE, True
+    
+    # Verify subscription exists and belongs to this server (one lookup for both)
+    subscription = await db.get_subscription_for_server(subscription_id, guild_id)
+    if not subscription:
+        return SUBSCRIPTION_NOT_FOUND_MESSAGE.format(subscription_id=subscription_id), True
+    
+    # Add excluded tag
+    added = await db.add_excluded_tag(subscription_id, tag_name)
+    if not added:
+        return "⚠️ Tag is already in the exclusion list.", True
+    
+    invalidate_list_cache(subscription["channel_id"])
+    logger.info(f"Added excluded tag: subscription_id={subscription_id}, tag_name={tag_name}, user_id={user_id}")
+    return (
+        f"✅ Added tag to exclusion list.\n"
+        f"**Subscription ID:** {subscription_id}\n"
+        f"**Excluded Tag:** {tag_name}"
+    ), False
+
+
+async def _do_unexclude(subscription_id: int, guild_id: int, tag_url: str, user_id: int) -> Tuple[str, bool]:
+    """Remove a tag exclusion, returning the reply text and whether it should be ephemeral."""
+    # Extract and validate the tag name before touching the database
+    tag_name = extract_tag_name_from_url(tag_url)
+    if not tag_name or len(tag_name) > MAX_TAG_NAME_LENGTH:
+        return INVALID_TAG_NAME_MESSAGE, True
+    
+    # Verify subscription exists and belongs to this server (one lookup for both)
+    subscription = await db.get_subscription_for_server(subscription_id, guild_id)
+    if not subscription:
+        return SUBSCRIPTION_NOT_FOUND_MESSAGE.format(subscription_id=subscription_id), True
+    
+    # Remove excluded tag
+    removed = await db.remove_excluded_tag(subscription_id, tag_name)
+    if not removed:
+        return "⚠️ Tag was not in the exclusion list.", True
+    
+    invalidate_list_cache(subscription["channel_id"])
+    logger.info(f"Removed excluded tag: subscription_id={subscription_id}, tag_name={tag_name}, user_id={user_id}")
+    return (
+        f"✅ Removed tag from exclusion list.\n"
+        f"**Subscription ID:** {subscription_id}\n"
+        f"**Tag:** {tag_name}"
+    ), False
 
 
 class ExcludeCommand(commands.Cog):
@@ -53,48 +118,8 @@ class ExcludeCommand(commands.Cog):
         await interaction.response.defer(ephemeral=True)
         
         try:
-            # Verify subscription exists and belongs to this server
-            subscription = await db.get_subscription_by_id(subscription_id)
-            if not subscription:
-                await interaction.followup.send(
-                    f"❌ Subscription ID {subscription_id} not found.",
-                    ephemeral=True
-                )
-                return
-            
-            # Check if user has permission (must be in the same server)
-            if interaction.guild.id != subscription["server_id"]:
-                await interaction.followup.send(
-                    "❌ You can only manage subscriptions in your own server.",
-                    ephemeral=True
-                )
-                return
-            
-            # Extract and clean tag name
-            tag_name = extract_tag_name_from_url(tag_url)
-            if len(tag_name) > 500:
-                await interaction.followup.send(
-                    "❌ Tag name is too long (max 500 characters).",
-                    ephemeral=True
-                )
-                return
-            
-            # Add excluded tag
-            added = await db.add_excluded_tag(subscription_id, tag_name)
-            
-            if added:
-                await interaction.followup.send(
-                    f"✅ Added tag to exclusion list.\n"
-                    f"**Subscription ID:** {subscription_id}\n"
-                    f"**Excluded Tag:** {tag_name}",
-                    ephemeral=False
-                )
-                logger.info(f"Added excluded tag: subscription_id={subscription_id}, tag_name={tag_name}, user_id={interaction.user.id}")
-            else:
-                await interaction.followup.send(
-                    f"⚠️ Tag is already in the exclusion list.",
-                    ephemeral=True
-                )
+            reply, ephemeral = await _do_exclude(subscription_id, interaction.guild_id, tag_url, interaction.user.id)
+            await interaction.followup.send(reply, ephemeral=ephemeral)
         
         except Exception as e:
             logger.error(f"Error in exclude command: {e}", exc_info=True)
@@ -119,41 +144,8 @@ class ExcludeCommand(commands.Cog):
         await interaction.response.defer(ephemeral=True)
         
         try:
-            # Verify subscription exists and belongs to this server
-            subscription = await db.get_subscription_by_id(subscription_id)
-            if not subscription:
-                await interaction.followup.send(
-                    f"❌ Subscription ID {subscription_id} not found.",
-                    ephemeral=True
-                )
-                return
-            
-            if interaction.guild.id != subscription["server_id"]:
-                await interaction.followup.send(
-                    "❌ You can only manage subscriptions in your own server.",
-                    ephemeral=True
-                )
-                return
-            
-            # Extract and clean tag name
-            tag_name = extract_tag_name_from_url(tag_url)
-            
-            # Remove excluded tag
-            removed = await db.remove_excluded_tag(subscription_id, tag_name)
-            
-            if removed:
-                await interaction.followup.send(
-                    f"✅ Removed tag from exclusion list.\n"
-                    f"**Subscription ID:** {subscription_id}\n"
-                    f"**Tag:** {tag_name}",
-                    ephemeral=False
-                )
-                logger.info(f"Removed excluded tag: subscription_id={subscription_id}, tag_name={tag_name}, user_id={interaction.user.id}")
-            else:
-                await interaction.followup.send(
-                    f"⚠️ Tag was not in the exclusion list.",
-                    ephemeral=True
-                )
+            reply, ephemeral = await _do_unexclude(subscription_id, interaction.guild_id, tag_url, interaction.user.id)
+            await interaction.followup.send(reply, ephemeral=ephemeral)
         
         except Exception as e:
             logger.error(f"Error in unexclude command: {e}", exc_info=True)
@@ -166,31 +158,8 @@ class ExcludeCommand(commands.Cog):
     async def exclude_prefix(self, ctx: commands.Context, subscription_id: int, tag_url: str):
         """Prefix command to exclude a tag."""
         try:
-            subscription = await db.get_subscription_by_id(subscription_id)
-            if not subscription:
-                await ctx.send(f"❌ Subscription ID {subscription_id} not found.")
-                return
-            
-            if ctx.guild.id != subscription["server_id"]:
-                await ctx.send("❌ You can only manage subscriptions in your own server.")
-                return
-            
-            tag_name = extract_tag_name_from_url(tag_url)
-            if len(tag_name) > 500:
-                await ctx.send("❌ Tag name is too long (max 500 characters).")
-                return
-            
-            added = await db.add_excluded_tag(subscription_id, tag_name)
-            
-            if added:
-                await ctx.send(
-                    f"✅ Added tag to exclusion list.\n"
-                    f"**Subscription ID:** {subscription_id}\n"
-                    f"**Excluded Tag:** {tag_name}"
-                )
-                logger.info(f"Added excluded tag: subscription_id={subscription_id}, tag_name={tag_name}, user_id={ctx.author.id}")
-            else:
-                await ctx.send("⚠️ Tag is already in the exclusion list.")
+            reply, _ = await _do_exclude(subscription_id, ctx.guild.id, tag_url, ctx.author.id)
+            await ctx.send(reply)
         
         except Exception as e:
             logger.error(f"Error in exclude command: {e}", exc_info=True)
@@ -200,28 +169,8 @@ class ExcludeCommand(commands.Cog):
     async def unexclude_prefix(self, ctx: commands.Context, subscription_id: int, tag_url: str):
         """Prefix command to remove an exclusion."""
         try:
-            subscription = await db.get_subscription_by_id(subscription_id)
-            if not subscription:
-                await ctx.send(f"❌ Subscription ID {subscription_id} not found.")
-                return
-            
-            if ctx.guild.id != subscription["server_id"]:
-                await ctx.send("❌ You can only manage subscriptions in your own server.")
-                return
-            
-            tag_name = extract_tag_name_from_url(tag_url)
-            
-            removed = await db.remove_excluded_tag(subscription_id, tag_name)
-            
-            if removed:
-                await ctx.send(
-                    f"✅ Removed tag from exclusion list.\n"
-                    f"**Subscription ID:** {subscription_id}\n"
-                    f"**Tag:** {tag_name}"
-                )
-                logger.info(f"Removed excluded tag: subscription_id={subscription_id}, tag_name={tag_name}, user_id={ctx.author.id}")
-            else:
-                await ctx.send("⚠️ Tag was not in the exclusion list.")
+            reply, _ = await _do_unexclude(subscription_id, ctx.guild.id, tag_url, ctx.author.id)
+            await ctx.send(reply)
         
         except Exception as e:
             logger.error(f"Error in unexclude command: {e}", exc_info=True)
@@ -4,9 +4,23 @@ from discord import app_commands
 from discord.ext import commands
 import logging
 from database import db
+from cache import TTLCache
+from feed_parser import FeedParser
 
 logger = logging.getLogger(__name__)
 
+# Discord's maximum embed description length
+EMBED_DESCRIPTION_LIMIT = 4096
+
+# Rendered /list output per (channel_id, command kind), for users re-running /list
+LIST_CACHE = TTLCache(maxsize=256, ttl=30)
+
+
+def invalidate_list_cache(channel_id: int):
+    """Drop cached /list output for a channel after its subscriptions change."""
+    LIST_CACHE.invalidate((channel_id, "slash"))
+    LIST_CACHE.invalidate((channel_id, "prefix"))
+
 
 class ListCommand(commands.Cog):
     """List command for viewing subscriptions."""
@@ -28,9 +42,15 @@ class ListCommand(commands.Cog):
         await interaction.response.defer(ephemeral=True)
         
         target_channel = channel or interaction.channel
+        target_channel_id = channel.id if channel else interaction.channel_id
         
         try:
-            subscriptions = await db.get_subscriptions_by_channel(target_channel.id)
+            cached_embed = LIST_CACHE.get((target_channel_id, "slash"))
+            if cached_embed is not None:
+                await interaction.followup.send(embed=cached_embed, ephemeral=False)
+                return
+            
+            subscriptions = await db.get_subscriptions_by_channel(target_channel_id)
             
             if not subscriptions:
                 await interaction.followup.send(
@@ -39,35 +59,35 @@ class ListCommand(commands.Cog):
                 )
                 return
             
-            # Build embed
+            # Build one row per subscription and put them all in the description
+            rows = []
+            description_length = 0
+            for sub in subscriptions[:25]:
+                tag_id = sub["tag_id"]
+                created_at = sub["created_str"] or "Unknown"
+                row = (
+                    f"**ID: {sub['id']}**\n"
+                    f"**Tag ID:** {tag_id}\n"
+                    f"**Feed URL:** [Link]({FeedParser.construct_feed_url(tag_id)})\n"
+                    f"**Excluded Tags:** {sub['excluded_count']}\n"
+                    f"**Created:** {created_at}"
+                )
+                # Stay within the embed description limit (rows are joined by a blank line)
+                description_length += len(row) + 2
+                if description_length > EMBED_DESCRIPTION_LIMIT:
+                    break
+                rows.append(row)
+            
             embed = discord.Embed(
                 title=f"Subscriptions for {target_channel.name}",
+                description="\n\n".join(rows),
                 color=discord.Color.blue()
             )
             
-            for sub in subscriptions[:25]:  # Discord limit is 25 fields
-                tag_id = sub["tag_id"]
-                subscription_id = sub["id"]
-                created_at = sub["created_at"].strftime("%Y-%m-%d") if sub["created_at"] else "Unknown"
-                
-                # Get excluded tags count
-                excluded_tags = await db.get_excluded_tags(subscription_id)
-                excluded_count = len(excluded_tags)
-                
-                embed.add_field(
-                    name=f"ID: {subscription_id}",
-                    value=(
-                        f"**Tag ID:** {tag_id}\n"
-                        f"**Feed URL:** [Link](https://archiveofourown.org/tags/{tag_id}/feed.atom)\n"
-                        f"**Excluded Tags:** {excluded_count}\n"
-                        f"**Created:** {created_at}"
-                    ),
-                    inline=False
-                )
-            
-            if len(subscriptions) > 25:
-                embed.set_footer(text=f"Showing 25 of {len(subscriptions)} subscriptions")
+            if len(subscriptions) > len(rows):
+                embed.set_footer(text=f"Showing {len(rows)} of {len(subscriptions)} subscriptions")
             
+            LIST_CACHE.set((target_channel_id, "slash"), embed)
             await interaction.followup.send(embed=embed, ephemeral=False)
         
         except Exception as e:
@@ -83,6 +103,11 @@ class ListCommand(commands.Cog):
         target_channel = channel or ctx.channel
         
         try:
+            cached_message = LIST_CACHE.get((target_channel.id, "prefix"))
+            if cached_message is not None:
+                await ctx.send(cached_message)
+                return
+            
             subscriptions = await db.get_subscriptions_by_channel(target_channel.id)
             
             if not subscriptions:
@@ -95,21 +120,21 @@ class ListCommand(commands.Cog):
             for sub in subscriptions[:20]:  # Limit to avoid message length issues
                 tag_id = sub["tag_id"]
                 subscription_id = sub["id"]
-                created_at = sub["created_at"].strftime("%Y-%m-%d") if sub["created_at"] else "Unknown"
-                
-                excluded_tags = await db.get_excluded_tags(subscription_id)
-                excluded_count = len(excluded_tags)
+                created_at = sub["created_str"] or "Unknown"
+                excluded_count = sub["excluded_count"]
                 
                 message_parts.append(
                     f"**ID {subscription_id}:** Tag ID `{tag_id}`\n"
-                    f"  Feed: https://archiveofourown.org/tags/{tag_id}/feed.atom\n"
+                    f"  Feed: {FeedParser.construct_feed_url(tag_id)}\n"
                     f"  Excluded Tags: {excluded_count} | Created: {created_at}\n"
                 )
             
             if len(subscriptions) > 20:
                 message_parts.append(f"\n*Showing 20 of {len(subscriptions)} subscriptions*")
             
-            await ctx.send("".join(message_parts))
+            message = "".join(message_parts)
+            LIST_CACHE.set((target_channel.id, "prefix"), message)
+            await ctx.send(message)
         
         except Exception as e:
             logger.error(f"Error in list command: {e}", exc_info=True)
@@ -8,18 +8,33 @@ from database import db
 logger = logging.getLogger(__name__)
 
 
+# Accepted boolean string representations
+BOOLEAN_VALUES = {
+    'true': True, '1': True, 'yes': True, 'on': True, 'enable': True, 'enabled': True,
+    'false': False, '0': False, 'no': False, 'off': False, 'disable': False, 'disabled': False,
+}
+
+# Reply sent when a settings value can't be parsed as a boolean
+INVALID_BOOLEAN_MESSAGE = "❌ Invalid value. Use: true/false, on/off, yes/no, 1/0"
+
+
 def parse_boolean(value: str) -> bool:
     """Parse various boolean string representations."""
-    value_lower = value.lower().strip()
-    true_values = ['true', '1', 'yes', 'on', 'enable', 'enabled']
-    false_values = ['false', '0', 'no', 'off', 'disable', 'disabled']
+    try:
+        return BOOLEAN_VALUES[value.lower().strip()]
+    except KeyError:
+        raise ValueError(f"Invalid boolean value: {value}") from None
+
+
+async def _do_settings_set(guild_id: int, bool_value: bool, user_id: int) -> str:
+    """Store the require_permissions setting and return the confirmation reply."""
+    await db.set_require_permissions(guild_id, bool_value, user_id)
     
-    if value_lower in true_values:
-        return True
-    elif value_lower in false_values:
-        return False
-    else:
-        raise ValueError(f"Invalid boolean value: {value}")
+    status = "enabled" if bool_value else "disabled"
+    return (
+        f"✅ Permission requirement {status} for this server.\n"
+        f"**Setting:** `require_permissions` = `{bool_value}`"
+    )
 
 
 class SettingsCommand(commands.Cog):
@@ -53,32 +68,42 @@ class SettingsCommand(commands.Cog):
             if setting.lower() == "require_permissions":
                 try:
                     bool_value = parse_boolean(value)
-                    await db.set_require_permissions(
-                        interaction.guild.id,
-                        bool_value,
-                        interaction.user.id
-                    )
-                    
-                    status = "enabled" if bool_value else "disabled"
+                except ValueError:
                     await interaction.response.send_message(
-                        f"✅ Permission requirement {status} for this server.\n"
-                        f"**Setting:** `require_permissions` = `{bool_value}`",
-                        ephemeral=False
+                        INVALID_BOOLEAN_MESSAGE,
+                        ephemeral=True
                     )
-                    logger.info(f"Updated require_permissions for server {interaction.guild.id}: {bool_value}, user_id={interaction.user.id}")
-                except ValueError as e:
-                    await interaction.response.send_message(
-                        f"❌ Invalid value. Use: true/false, on/off, yes/no, 1/0",
+                    return
+                
+                # Defer before the DB write to avoid interaction timeout
+                await interaction.response.defer()
+                try:
+                    reply = await _do_settings_set(interaction.guild_id, bool_value, interaction.user.id)
+                except Exception as e:
+                    logger.error(f"Error in settings command: {e}", exc_info=True)
+                    await interaction.followup.send(
+                        f"❌ An error occurred while updating settings: {str(e)}",
                         ephemeral=True
                     )
+                    return
+                await interaction.followup.send(reply)
             else:
                 await interaction.response.send_message(
                     f"❌ Unknown setting: {setting}. Available: `require_permissions`",
                     ephemeral=True
                 )
         else:
-            # Show current settings
-            settings = await db.get_server_settings(interaction.guild.id)
+            # Show current settings (defer before the DB read to avoid interaction timeout)
+            await interaction.response.defer()
+            try:
+                settings = await db.get_server_settings(interaction.guild_id)
+            except Exception as e:
+                logger.error(f"Error in settings command: {e}", exc_info=True)
+                await interaction.followup.send(
+                    f"❌ An error occurred while loading settings: {str(e)}",
+                    ephemeral=True
+                )
+                return
             
             embed = discord.Embed(
                 title="Server Settings",
@@ -123,7 +148,7 @@ class SettingsCommand(commands.Cog):
             
             embed.set_footer(text="Use /settings require_permissions <value> to change")
             
-            await interaction.response.send_message(embed=embed, ephemeral=False)
+            await interaction.followup.send(embed=embed)
     
     @commands.group(name="settings", invoke_without_command=True)
     async def settings_prefix(self, ctx: commands.Context):
@@ -160,20 +185,11 @@ class SettingsCommand(commands.Cog):
         
         try:
             bool_value = parse_boolean(value)
-            await db.set_require_permissions(
-                ctx.guild.id,
-                bool_value,
-                ctx.author.id
-            )
-            
-            status = "enabled" if bool_value else "disabled"
-            await ctx.send(
-                f"✅ Permission requirement {status} for this server.\n"
-                f"**Setting:** `require_permissions` = `{bool_value}`"
-            )
-            logger.info(f"Updated require_permissions for server {ctx.guild.id}: {bool_value}, user_id={ctx.author.id}")
         except ValueError:
-            await ctx.send("❌ Invalid value. Use: true/false, on/off, yes/no, 1/0")
+            await ctx.send(INVALID_BOOLEAN_MESSAGE)
+            return
+        
+        await ctx.send(await _do_settings_set(ctx.guild.id, bool_value, ctx.author.id))
 
 
 async def setup(bot):
@@ -2,29 +2,11 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
+import asyncio
 import logging
-import re
 from database import db
-
-# Import tag extraction functions (avoid circular import by defining here)
-AO3_FEED_PATTERN = re.compile(r'^https?://archiveofourown\.org/tags/([^/]+)/feed\.atom(\?.*)?$')
-TAG_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,100}$')
-
-
-def extract_tag_id(input_str: str):
-    """Extract tag_id from input (handles both full URL and just tag_id)."""
-    input_str = input_str.strip()
-    match = AO3_FEED_PATTERN.match(input_str)
-    if match:
-        return match.group(1)
-    if TAG_ID_PATTERN.match(input_str):
-        return input_str
-    return None
-
-
-def validate_tag_id(tag_id: str) -> bool:
-    """Validate that tag_id is valid format."""
-    return bool(TAG_ID_PATTERN.match(tag_id))
+from commands.tag_utils import extract_tag_id, validate_tag_id
+from feed_parser import FeedParser
 
 logger = logging.getLogger(__name__)
 
@@ -59,15 +41,18 @@ class StatusCommand(commands.Cog):
         
         try:
             if subscription_id:
-                subscription = await db.get_subscription_by_id(subscription_id)
-                if not subscription:
+                # Both lookups run back to back on one connection
+                async with db.acquire() as conn:
+                    feed = await db.get_feed_by_subscription_id(subscription_id, conn=conn)
+                    if feed:
+                        subscriptions = await db.get_subscriptions_by_feed(feed["id"], conn=conn)
+                if not feed:
                     await interaction.followup.send(
                         f"❌ Subscription ID {subscription_id} not found.",
                         ephemeral=True
                     )
                     return
-                tag_id_value = subscription["tag_id"]
-                feed = await db.get_feed_by_tag_id(tag_id_value)
+                tag_id_value = feed["tag_id"]
             else:
                 extracted_tag_id = extract_tag_id(tag_id)
                 if not extracted_tag_id or not validate_tag_id(extracted_tag_id):
@@ -76,7 +61,11 @@ class StatusCommand(commands.Cog):
                         ephemeral=True
                     )
                     return
-                feed = await db.get_feed_by_tag_id(extracted_tag_id)
+                # The feed and its subscriptions are independent lookups by tag_id
+                feed, subscriptions = await asyncio.gather(
+                    db.get_feed_by_tag_id(extracted_tag_id),
+                    db.get_subscriptions_by_tag_id(extracted_tag_id)
+                )
                 if not feed:
                     await interaction.followup.send(
                         f"❌ Feed not found: {extracted_tag_id}",
@@ -85,13 +74,10 @@ class StatusCommand(commands.Cog):
                     return
                 tag_id_value = extracted_tag_id
             
-            # Get all subscriptions for this feed
-            subscriptions = await db.get_subscriptions_by_feed(feed["id"])
-            
             # Build embed
             embed = discord.Embed(
                 title="Feed Status",
-                description=f"**Tag ID:** {tag_id_value}\n**Feed URL:** https://archiveofourown.org/tags/{tag_id_value}/feed.atom",
+                description=f"**Tag ID:** {tag_id_value}\n**Feed URL:** {FeedParser.construct_feed_url(tag_id_value)}",
                 color=discord.Color.green()
             )
             
@@ -130,14 +116,13 @@ class StatusCommand(commands.Cog):
             
             # List subscriptions
             if subscriptions:
-                sub_list = []
-                for sub in subscriptions[:10]:
-                    channel_mention = f"<#{sub['channel_id']}>"
-                    excluded_tags = await db.get_excluded_tags(sub["id"])
-                    excluded_count = len(excluded_tags)
-                    sub_list.append(
-                        f"**ID {sub['id']}:** {channel_mention} ({excluded_count} excluded tags)"
-                    )
+                shown = subscriptions[:10]
+                # Count excluded tags for all shown subscriptions in one query
+                excluded_counts = await db.get_excluded_tag_counts([sub["id"] for sub in shown])
+                sub_list = [
+                    f"**ID {sub['id']}:** <#{sub['channel_id']}> ({excluded_counts.get(sub['id'], 0)} excluded tags)"
+                    for sub in shown
+                ]
                 
                 if len(subscriptions) > 10:
                     sub_list.append(f"\n*...and {len(subscriptions) - 10} more*")
@@ -151,7 +136,7 @@ class StatusCommand(commands.Cog):
             await interaction.followup.send(embed=embed, ephemeral=False)
         
         except Exception as e:
-            logger.error(f"Error in status command: {e}", exc_info=True)
+            logger.error("Error in status command: %s", e, exc_info=True)
             await interaction.followup.send(
                 f"❌ An error occurred while getting status: {str(e)}",
                 ephemeral=True
@@ -171,54 +156,59 @@ class StatusCommand(commands.Cog):
         
         try:
             if subscription_id:
-                subscription = await db.get_subscription_by_id(subscription_id)
-                if not subscription:
+                # Both lookups run back to back on one connection
+                async with db.acquire() as conn:
+                    feed = await db.get_feed_by_subscription_id(subscription_id, conn=conn)
+                    if feed:
+                        subscriptions = await db.get_subscriptions_by_feed(feed["id"], conn=conn)
+                if not feed:
                     await ctx.send(f"❌ Subscription ID {subscription_id} not found.")
                     return
-                tag_id_value = subscription["tag_id"]
-                feed = await db.get_feed_by_tag_id(tag_id_value)
+                tag_id_value = feed["tag_id"]
             else:
                 extracted_tag_id = extract_tag_id(tag_id)
                 if not extracted_tag_id or not validate_tag_id(extracted_tag_id):
                     await ctx.send("❌ Invalid tag ID or feed URL.")
                     return
-                feed = await db.get_feed_by_tag_id(extracted_tag_id)
+                # The feed and its subscriptions are independent lookups by tag_id
+                feed, subscriptions = await asyncio.gather(
+                    db.get_feed_by_tag_id(extracted_tag_id),
+                    db.get_subscriptions_by_tag_id(extracted_tag_id)
+                )
                 if not feed:
                     await ctx.send(f"❌ Feed not found: {extracted_tag_id}")
                     return
                 tag_id_value = extracted_tag_id
             
-            subscriptions = await db.get_subscriptions_by_feed(feed["id"])
-            
+            last_updated_line = (
+                f"**Last Updated:** {feed['last_updated']:%Y-%m-%d %H:%M:%S UTC}\n" if feed["last_updated"] else ""
+            )
+            created_line = f"**Created:** {feed['created_at']:%Y-%m-%d}\n" if feed.get("created_at") else ""
             message_parts = [
-                f"**Feed Status:**\n",
-                f"**Tag ID:** {tag_id_value}\n",
-                f"**Feed URL:** https://archiveofourown.org/tags/{tag_id_value}/feed.atom\n",
-                f"**Feed ID:** {feed['id']}\n",
+                f"**Feed Status:**\n"
+                f"**Tag ID:** {tag_id_value}\n"
+                f"**Feed URL:** {FeedParser.construct_feed_url(tag_id_value)}\n"
+                f"**Feed ID:** {feed['id']}\n"
                 f"**Subscriptions:** {len(subscriptions)}\n"
+                f"{last_updated_line}"
+                f"{created_line}"
             ]
             
-            if feed["last_updated"]:
-                message_parts.append(f"**Last Updated:** {feed['last_updated'].strftime('%Y-%m-%d %H:%M:%S UTC')}\n")
-            
-            if feed.get("created_at"):
-                message_parts.append(f"**Created:** {feed['created_at'].strftime('%Y-%m-%d')}\n")
-            
             if subscriptions:
                 message_parts.append("\n**Subscribed Channels:**\n")
-                for sub in subscriptions[:10]:
-                    excluded_tags = await db.get_excluded_tags(sub["id"])
-                    excluded_count = len(excluded_tags)
-                    message_parts.append(
-                        f"  ID {sub['id']}: <#{sub['channel_id']}> ({excluded_count} excluded tags)\n"
-                    )
+                shown = subscriptions[:10]
+                excluded_counts = await db.get_excluded_tag_counts([sub["id"] for sub in shown])
+                message_parts.extend(
+                    f"  ID {sub['id']}: <#{sub['channel_id']}> ({excluded_counts.get(sub['id'], 0)} excluded tags)\n"
+                    for sub in shown
+                )
                 if len(subscriptions) > 10:
                     message_parts.append(f"  ...and {len(subscriptions) - 10} more\n")
             
             await ctx.send("".join(message_parts))
         
         except Exception as e:
-            logger.error(f"Error in status command: {e}", exc_info=True)
+            logger.error("Error in status command: %s", e, exc_info=True)
             await ctx.send(f"❌ An error occurred while getting status: {str(e)}")
 
 
@@ -0,0 +1,40 @@
+"""Tag ID parsing shared by the track, untrack and status commands."""
+import re
+import string
+from typing import Optional
+
+# AO3 RSS feed URL pattern - extract tag_id (bounded so hostile input can't make it backtrack)
+AO3_FEED_PATTERN = re.compile(
+    r'\Ahttps?://archiveofourown\.org/tags/([A-Za-z0-9_%~.-]{1,100})/feed\.atom(?:\?\S*)?\Z',
+    re.ASCII
+)
+# Tag ID characters (alphanumeric, hyphens, underscores) and max length
+TAG_ID_CHARS = string.ascii_letters + string.digits + "_-"
+TAG_ID_MAX_LENGTH = 100
+
+# Bound match method, called directly on the command hot path
+_FEED_MATCH = AO3_FEED_PATTERN.match
+
+
+def extract_tag_id(input_str: str) -> Optional[str]:
+    """Extract tag_id from input (handles both full URL and just tag_id)."""
+    # Most input is already trimmed; skip the copy strip() would make
+    if input_str[:1].isspace() or input_str[-1:].isspace():
+        input_str = input_str.strip()
+    
+    # Only run the URL regex on input that looks like a URL
+    if input_str.startswith(("http://", "https://")):
+        match = _FEED_MATCH(input_str)
+        return match.group(1) if match else None
+    
+    # Otherwise it must be a bare tag_id
+    if validate_tag_id(input_str):
+        return input_str
+    
+    return None
+
+
+def validate_tag_id(tag_id: str) -> bool:
+    """Validate that tag_id is valid format."""
+    # Stripping every allowed character leaves nothing iff the whitelist covers the ID
+    return 1 <= len(tag_id) <= TAG_ID_MAX_LENGTH and not tag_id.strip(TAG_ID_CHARS)
@@ -2,40 +2,14 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-from typing import Optional
 import logging
-import re
 from database import db
-from config import config
+from commands.tag_utils import extract_tag_id, validate_tag_id
+from commands.list import invalidate_list_cache
+from config import MAX_SUBSCRIPTIONS_PER_CHANNEL
 
 logger = logging.getLogger(__name__)
 
-# AO3 RSS feed URL pattern - extract tag_id
-AO3_FEED_PATTERN = re.compile(r'^https?://archiveofourown\.org/tags/([^/]+)/feed\.atom(\?.*)?$')
-# Tag ID pattern (alphanumeric, hyphens, underscores, max 100 chars)
-TAG_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,100}$')
-
-
-def extract_tag_id(input_str: str) -> Optional[str]:
-    """Extract tag_id from input (handles both full URL and just tag_id)."""
-    input_str = input_str.strip()
-    
-    # Try full URL pattern first
-    match = AO3_FEED_PATTERN.match(input_str)
-    if match:
-        return match.group(1)
-    
-    # Try just tag_id pattern
-    if TAG_ID_PATTERN.match(input_str):
-        return input_str
-    
-    return None
-
-
-def validate_tag_id(tag_id: str) -> bool:
-    """Validate that tag_id is valid format."""
-    return bool(TAG_ID_PATTERN.match(tag_id))
-
 
 class TrackCommand(commands.Cog):
     """Track command for subscribing to RSS feeds."""
@@ -71,8 +45,16 @@ class TrackCommand(commands.Cog):
             )
             return
         
+        # Check bot permissions (no DB round trip needed)
+        if not target_channel.permissions_for(interaction.guild.me).send_messages:
+            await interaction.followup.send(
+                f"❌ I don't have permission to send messages in {target_channel.mention}",
+                ephemeral=True
+            )
+            return
+        
         # Check permissions if required by server
-        require_perms = await db.get_require_permissions(interaction.guild.id)
+        require_perms = await db.get_require_permissions(interaction.guild_id)
         if require_perms:
             if not interaction.user.guild_permissions.manage_channels:
                 await interaction.followup.send(
@@ -82,40 +64,28 @@ class TrackCommand(commands.Cog):
                 return
         
         # Check subscription limit
-        existing_subs = await db.get_subscriptions_by_channel(target_channel.id)
-        if len(existing_subs) >= config.MAX_SUBSCRIPTIONS_PER_CHANNEL:
-            await interaction.followup.send(
-                f"❌ Channel {target_channel.mention} has reached the maximum of {config.MAX_SUBSCRIPTIONS_PER_CHANNEL} subscriptions.",
-                ephemeral=True
-            )
-            return
-        
-        # Check permissions
-        if not target_channel.permissions_for(interaction.guild.me).send_messages:
+        existing_count = await db.count_subscriptions_by_channel(target_channel.id)
+        if existing_count >= MAX_SUBSCRIPTIONS_PER_CHANNEL:
             await interaction.followup.send(
-                f"❌ I don't have permission to send messages in {target_channel.mention}",
+                f"❌ Channel {target_channel.mention} has reached the maximum of {MAX_SUBSCRIPTIONS_PER_CHANNEL} subscriptions.",
                 ephemeral=True
             )
             return
         
         try:
-            # Get or create feed
-            feed_id = await db.get_or_create_feed(extracted_tag_id)
-            
-            # Check if subscription already exists
-            if await db.subscription_exists(feed_id, target_channel.id):
+            # Get or create feed and subscribe in one round trip (None if already subscribed)
+            feed_id, subscription_id = await db.create_feed_subscription(
+                extracted_tag_id,
+                target_channel.id,
+                interaction.guild_id
+            )
+            if subscription_id is None:
                 await interaction.followup.send(
                     f"⚠️ {target_channel.mention} is already tracking this feed.",
                     ephemeral=True
                 )
                 return
-            
-            # Create subscription
-            subscription_id = await db.create_subscription(
-                feed_id,
-                target_channel.id,
-                interaction.guild.id
-            )
+            invalidate_list_cache(target_channel.id)
             
             await interaction.followup.send(
                 f"✅ Successfully subscribed {target_channel.mention} to feed!\n"
@@ -123,10 +93,10 @@ class TrackCommand(commands.Cog):
                 f"**Subscription ID:** {subscription_id}",
                 ephemeral=False
             )
-            logger.info(f"Created subscription: feed_id={feed_id}, channel_id={target_channel.id}, subscription_id={subscription_id}, user_id={interaction.user.id}")
+            logger.info("Created subscription: feed_id=%s, channel_id=%s, subscription_id=%s, user_id=%s", feed_id, target_channel.id, subscription_id, interaction.user.id)
         
         except Exception as e:
-            logger.error(f"Error in track command: {e}", exc_info=True)
+            logger.error("Error in track command: %s", e, exc_info=True)
             await interaction.followup.send(
                 f"❌ An error occurred while tracking the feed: {str(e)}",
                 ephemeral=True
@@ -147,6 +117,11 @@ class TrackCommand(commands.Cog):
             )
             return
         
+        # Check bot permissions (no DB round trip needed)
+        if not target_channel.permissions_for(ctx.guild.me).send_messages:
+            await ctx.send(f"❌ I don't have permission to send messages in {target_channel.mention}")
+            return
+        
         # Check permissions if required by server
         require_perms = await db.get_require_permissions(ctx.guild.id)
         if require_perms:
@@ -155,41 +130,32 @@ class TrackCommand(commands.Cog):
                 return
         
         # Check subscription limit
-        existing_subs = await db.get_subscriptions_by_channel(target_channel.id)
-        if len(existing_subs) >= config.MAX_SUBSCRIPTIONS_PER_CHANNEL:
-            await ctx.send(f"❌ Channel {target_channel.mention} has reached the maximum of {config.MAX_SUBSCRIPTIONS_PER_CHANNEL} subscriptions.")
-            return
-        
-        # Check permissions
-        if not target_channel.permissions_for(ctx.guild.me).send_messages:
-            await ctx.send(f"❌ I don't have permission to send messages in {target_channel.mention}")
+        existing_count = await db.count_subscriptions_by_channel(target_channel.id)
+        if existing_count >= MAX_SUBSCRIPTIONS_PER_CHANNEL:
+            await ctx.send(f"❌ Channel {target_channel.mention} has reached the maximum of {MAX_SUBSCRIPTIONS_PER_CHANNEL} subscriptions.")
             return
         
         try:
-            # Get or create feed
-            feed_id = await db.get_or_create_feed(extracted_tag_id)
-            
-            # Check if subscription already exists
-            if await db.subscription_exists(feed_id, target_channel.id):
-                await ctx.send(f"⚠️ {target_channel.mention} is already tracking this feed.")
-                return
-            
-            # Create subscription
-            subscription_id = await db.create_subscription(
-                feed_id,
+            # Get or create feed and subscribe in one round trip (None if already subscribed)
+            feed_id, subscription_id = await db.create_feed_subscription(
+                extracted_tag_id,
                 target_channel.id,
                 ctx.guild.id
             )
+            if subscription_id is None:
+                await ctx.send(f"⚠️ {target_channel.mention} is already tracking this feed.")
+                return
+            invalidate_list_cache(target_channel.id)
             
             await ctx.send(
                 f"✅ Successfully subscribed {target_channel.mention} to feed!\n"
                 f"**Tag ID:** {extracted_tag_id}\n"
                 f"**Subscription ID:** {subscription_id}"
             )
-            logger.info(f"Created subscription: feed_id={feed_id}, channel_id={target_channel.id}, subscription_id={subscription_id}, user_id={ctx.author.id}")
+            logger.info("Created subscription: feed_id=%s, channel_id=%s, subscription_id=%s, user_id=%s", feed_id, target_channel.id, subscription_id, ctx.author.id)
         
         except Exception as e:
-            logger.error(f"Error in track command: {e}", exc_info=True)
+            logger.error("Error in track command: %s", e, exc_info=True)
             await ctx.send(f"❌ An error occurred while tracking the feed: {str(e)}")
 
 
@@ -3,28 +3,9 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 import logging
-import re
 from database import db
-
-# Import tag extraction functions (avoid circular import by defining here)
-AO3_FEED_PATTERN = re.compile(r'^https?://archiveofourown\.org/tags/([^/]+)/feed\.atom(\?.*)?$')
-TAG_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,100}$')
-
-
-def extract_tag_id(input_str: str):
-    """Extract tag_id from input (handles both full URL and just tag_id)."""
-    input_str = input_str.strip()
-    match = AO3_FEED_PATTERN.match(input_str)
-    if match:
-        return match.group(1)
-    if TAG_ID_PATTERN.match(input_str):
-        return input_str
-    return None
-
-
-def validate_tag_id(tag_id: str) -> bool:
-    """Validate that tag_id is valid format."""
-    return bool(TAG_ID_PATTERN.match(tag_id))
+from commands.tag_utils import extract_tag_id, validate_tag_id
+from commands.list import invalidate_list_cache
 
 logger = logging.getLogger(__name__)
 
@@ -61,8 +42,18 @@ class UntrackCommand(commands.Cog):
         
         target_channel = channel or interaction.channel
         
+        # Validate tag_id before any DB round trip
+        if not subscription_id:
+            extracted_tag_id = extract_tag_id(tag_id)
+            if not extracted_tag_id or not validate_tag_id(extracted_tag_id):
+                await interaction.followup.send(
+                    "❌ Invalid tag ID or feed URL.",
+                    ephemeral=True
+                )
+                return
+        
         # Check permissions if required by server
-        require_perms = await db.get_require_permissions(interaction.guild.id)
+        require_perms = await db.get_require_permissions(interaction.guild_id)
         if require_perms:
             if not interaction.user.guild_permissions.manage_channels:
                 await interaction.followup.send(
@@ -93,14 +84,6 @@ class UntrackCommand(commands.Cog):
                 tag_id_value = subscription["tag_id"]
             else:
                 # Use tag_id
-                extracted_tag_id = extract_tag_id(tag_id)
-                if not extracted_tag_id or not validate_tag_id(extracted_tag_id):
-                    await interaction.followup.send(
-                        "❌ Invalid tag ID or feed URL.",
-                        ephemeral=True
-                    )
-                    return
-                
                 feed = await db.get_feed_by_tag_id(extracted_tag_id)
                 if not feed:
                     await interaction.followup.send(
@@ -115,12 +98,13 @@ class UntrackCommand(commands.Cog):
             deleted = await db.delete_subscription(feed_id, target_channel.id)
             
             if deleted:
+                invalidate_list_cache(target_channel.id)
                 await interaction.followup.send(
                     f"✅ Successfully unsubscribed {target_channel.mention} from feed.\n"
                     f"**Tag ID:** {tag_id_value}",
                     ephemeral=False
                 )
-                logger.info(f"Deleted subscription: feed_id={feed_id}, channel_id={target_channel.id}, user_id={interaction.user.id}")
+                logger.info("Deleted subscription: feed_id=%s, channel_id=%s, user_id=%s", feed_id, target_channel.id, interaction.user.id)
             else:
                 await interaction.followup.send(
                     f"⚠️ {target_channel.mention} is not tracking this feed.",
@@ -128,7 +112,7 @@ class UntrackCommand(commands.Cog):
                 )
         
         except Exception as e:
-            logger.error(f"Error in untrack command: {e}", exc_info=True)
+            logger.error("Error in untrack command: %s", e, exc_info=True)
             await interaction.followup.send(
                 f"❌ An error occurred while untracking the feed: {str(e)}",
                 ephemeral=True
@@ -149,6 +133,13 @@ class UntrackCommand(commands.Cog):
         
         target_channel = channel or ctx.channel
         
+        # Validate tag_id before any DB round trip
+        if not subscription_id:
+            extracted_tag_id = extract_tag_id(tag_id)
+            if not extracted_tag_id or not validate_tag_id(extracted_tag_id):
+                await ctx.send("❌ Invalid tag ID or feed URL.")
+                return
+        
         # Check permissions if required by server
         require_perms = await db.get_require_permissions(ctx.guild.id)
         if require_perms:
@@ -170,11 +161,6 @@ class UntrackCommand(commands.Cog):
                 feed_id = subscription["feed_id"]
                 tag_id_value = subscription["tag_id"]
             else:
-                extracted_tag_id = extract_tag_id(tag_id)
-                if not extracted_tag_id or not validate_tag_id(extracted_tag_id):
-                    await ctx.send("❌ Invalid tag ID or feed URL.")
-                    return
-                
                 feed = await db.get_feed_by_tag_id(extracted_tag_id)
                 if not feed:
                     await ctx.send(f"❌ Feed not found: {extracted_tag_id}")
@@ -185,16 +171,17 @@ class UntrackCommand(commands.Cog):
             deleted = await db.delete_subscription(feed_id, target_channel.id)
             
             if deleted:
+                invalidate_list_cache(target_channel.id)
                 await ctx.send(
                     f"✅ Successfully unsubscribed {target_channel.mention} from feed.\n"
                     f"**Tag ID:** {tag_id_value}"
                 )
-                logger.info(f"Deleted subscription: feed_id={feed_id}, channel_id={target_channel.id}, user_id={ctx.author.id}")
+                logger.info("Deleted subscription: feed_id=%s, channel_id=%s, user_id=%s", feed_id, target_channel.id, ctx.author.id)
             else:
                 await ctx.send(f"⚠️ {target_channel.mention} is not tracking this feed.")
         
         except Exception as e:
-            logger.error(f"Error in untrack command: {e}", exc_info=True)
+            logger.error("Error in untrack command: %s", e, exc_info=True)
             await ctx.send(f"❌ An error occurred while untracking the feed: {str(e)}")
 
 
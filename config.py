@@ -1,43 +1,93 @@
 """Configuration management for AO3 Discord RSS Tracker Bot."""
 import os
+from dataclasses import dataclass, field
+from typing import Final
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
+def _int_env(name: str, default: int, lo: int = 0, hi: int = 2**31 - 1) -> int:
+    """Read an integer environment variable, failing fast if it is malformed or out of range."""
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got {raw!r}") from None
+    if not lo <= value <= hi:
+        raise ValueError(f"{name} must be between {lo} and {hi}, got {value}")
+    return value
+
+
+def _float_env(name: str, default: float, lo: float = 0.0, hi: float = float("inf")) -> float:
+    """Read a float environment variable, failing fast if it is malformed or out of range."""
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    try:
+        value = float(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be a number, got {raw!r}") from None
+    if not lo <= value <= hi:
+        raise ValueError(f"{name} must be between {lo} and {hi}, got {value}")
+    return value
+
+
+@dataclass(frozen=True, slots=True)
 class Config:
     """Bot configuration from environment variables."""
     
     # Discord Bot Token
-    DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
-    if not DISCORD_TOKEN:
-        raise ValueError("DISCORD_TOKEN environment variable is required")
+    DISCORD_TOKEN: str = os.getenv("DISCORD_TOKEN")
     
     # PostgreSQL Database Configuration
-    DB_HOST = os.getenv("DB_HOST", "localhost")
-    DB_PORT = int(os.getenv("DB_PORT", "5432"))
-    DB_NAME = os.getenv("DB_NAME", "ao3_tracker")
-    DB_USER = os.getenv("DB_USER", "postgres")
-    DB_PASSWORD = os.getenv("DB_PASSWORD", "")
-    
-    @property
-    def database_url(self) -> str:
-        """Get PostgreSQL connection URL."""
-        return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+    DB_HOST: str = os.getenv("DB_HOST", "localhost")
+    DB_PORT: int = _int_env("DB_PORT", 5432, 1, 65_535)
+    DB_NAME: str = os.getenv("DB_NAME", "ao3_tracker")
+    DB_USER: str = os.getenv("DB_USER", "postgres")
+    DB_PASSWORD: str = os.getenv("DB_PASSWORD", "")
+    DB_POOL_MIN_SIZE: int = _int_env("DB_POOL_MIN_SIZE", 5, 0)
+    DB_POOL_MAX_SIZE: int = _int_env("DB_POOL_MAX_SIZE", 20, 1)
+    DB_POOL_MAX_INACTIVE_LIFETIME: float = _float_env("DB_POOL_MAX_INACTIVE_LIFETIME", 300.0)  # Seconds before idle connections close
+    DB_STATEMENT_CACHE_SIZE: int = _int_env("DB_STATEMENT_CACHE_SIZE", 1024, 0)  # Prepared statements per connection
     
     # Bot Configuration
-    COMMAND_PREFIX = os.getenv("COMMAND_PREFIX", "!")
-    POLLING_INTERVAL = int(os.getenv("POLLING_INTERVAL", "3600"))  # Default: 1 hour in seconds
+    COMMAND_PREFIX: str = os.getenv("COMMAND_PREFIX", "!")
+    POLLING_INTERVAL: int = _int_env("POLLING_INTERVAL", 3600, 1)  # Default: 1 hour in seconds
+    FEED_POLL_CONCURRENCY: int = _int_env("FEED_POLL_CONCURRENCY", 5, 1)  # Max feeds fetched at once
+    FEED_FETCH_RATE_PER_MINUTE: int = _int_env("FEED_FETCH_RATE_PER_MINUTE", 30, 0)  # 0 disables the limit
+    # Days to keep notified_entries; 0 (default) keeps them forever. Pruned records let
+    # old works be re-posted when a feed's last seen entry disappears from it.
+    NOTIFIED_ENTRY_RETENTION_DAYS: int = _int_env("NOTIFIED_ENTRY_RETENTION_DAYS", 0, 0)
     
     # Configurable Limits
-    MAX_SUBSCRIPTIONS_PER_CHANNEL = int(os.getenv("MAX_SUBSCRIPTIONS_PER_CHANNEL", "50"))
-    MAX_FEEDS_GLOBAL = int(os.getenv("MAX_FEEDS_GLOBAL", "1000"))
-    COMMAND_COOLDOWN_SECONDS = int(os.getenv("COMMAND_COOLDOWN_SECONDS", "5"))
-    FEED_FETCH_TIMEOUT = int(os.getenv("FEED_FETCH_TIMEOUT", "30"))
-    CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", "3"))
+    MAX_SUBSCRIPTIONS_PER_CHANNEL: int = _int_env("MAX_SUBSCRIPTIONS_PER_CHANNEL", 50, 1, 10_000)
+    MAX_FEEDS_GLOBAL: int = _int_env("MAX_FEEDS_GLOBAL", 1000, 1)
+    COMMAND_COOLDOWN_SECONDS: int = _int_env("COMMAND_COOLDOWN_SECONDS", 5, 0)
+    FEED_FETCH_TIMEOUT: int = _int_env("FEED_FETCH_TIMEOUT", 30, 1)
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = _int_env("CIRCUIT_BREAKER_FAILURE_THRESHOLD", 3, 1)
     
     # Discord Intents
-    MESSAGE_CONTENT_INTENT = os.getenv("MESSAGE_CONTENT_INTENT", "true").lower() == "true"
+    MESSAGE_CONTENT_INTENT: bool = os.getenv("MESSAGE_CONTENT_INTENT", "true").lower() == "true"
+    
+    # PostgreSQL connection URL (derived once from the settings above)
+    database_url: str = field(init=False)
+    
+    def __post_init__(self):
+        if not self.DISCORD_TOKEN:
+            raise ValueError("DISCORD_TOKEN environment variable is required")
+        if self.DB_POOL_MIN_SIZE > self.DB_POOL_MAX_SIZE:
+            raise ValueError("DB_POOL_MIN_SIZE must not exceed DB_POOL_MAX_SIZE")
+        object.__setattr__(
+            self,
+            "database_url",
+            f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+        )
 
 
 config = Config()
+
+# Settings read on command hot paths, exported as plain module constants
+MAX_SUBSCRIPTIONS_PER_CHANNEL: Final[int] = config.MAX_SUBSCRIPTIONS_PER_CHANNEL
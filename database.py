@@ -1,18 +1,118 @@
 """Database operations for AO3 Discord RSS Tracker Bot."""
+import asyncio
 import asyncpg
+import json
 import logging
-from typing import Optional, List, Dict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, List, Dict, Set, FrozenSet, Tuple
 from datetime import datetime
 from config import config
+from cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Rarely-changing rows cached in process; writes through this class invalidate them
+CACHE_MAX_SIZE = 1024
+CACHE_TTL_SECONDS = 60
+
+# Schema DDL, executed as one multi-statement script on startup
+SCHEMA_SQL = """
+-- Create feeds table (stores tag_id, not full URL)
+CREATE TABLE IF NOT EXISTS feeds (
+    id SERIAL PRIMARY KEY,
+    tag_id TEXT UNIQUE NOT NULL,
+    last_updated TIMESTAMP,
+    last_entry_id TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Add HTTP cache validator columns to feeds tables created before they existed
+ALTER TABLE feeds ADD COLUMN IF NOT EXISTS etag TEXT;
+ALTER TABLE feeds ADD COLUMN IF NOT EXISTS last_modified TEXT;
+
+-- Create feed_channels table
+CREATE TABLE IF NOT EXISTS feed_channels (
+    id SERIAL PRIMARY KEY,
+    feed_id INTEGER REFERENCES feeds(id) ON DELETE CASCADE,
+    channel_id BIGINT NOT NULL,
+    server_id BIGINT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(feed_id, channel_id)
+);
+
+-- Create server_settings table
+CREATE TABLE IF NOT EXISTS server_settings (
+    id SERIAL PRIMARY KEY,
+    server_id BIGINT UNIQUE NOT NULL,
+    require_permissions BOOLEAN DEFAULT FALSE,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_by BIGINT
+);
+
+-- Create excluded_tags table (stores tag_name, not tag_url)
+CREATE TABLE IF NOT EXISTS excluded_tags (
+    id SERIAL PRIMARY KEY,
+    feed_channel_id INTEGER REFERENCES feed_channels(id) ON DELETE CASCADE,
+    tag_name TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(feed_channel_id, tag_name)
+);
+
+-- Create notified_entries table
+CREATE TABLE IF NOT EXISTS notified_entries (
+    id SERIAL PRIMARY KEY,
+    feed_channel_id INTEGER REFERENCES feed_channels(id) ON DELETE CASCADE,
+    entry_id TEXT NOT NULL,
+    notified_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(feed_channel_id, entry_id)
+);
+
+-- Create indexes for better performance
+CREATE INDEX IF NOT EXISTS idx_feeds_tag_id ON feeds(tag_id);
+CREATE INDEX IF NOT EXISTS idx_feed_channels_feed ON feed_channels(feed_id);
+CREATE INDEX IF NOT EXISTS idx_feed_channels_channel ON feed_channels(channel_id);
+CREATE INDEX IF NOT EXISTS idx_server_settings_server ON server_settings(server_id);
+CREATE INDEX IF NOT EXISTS idx_excluded_tags_subscription ON excluded_tags(feed_channel_id);
+CREATE INDEX IF NOT EXISTS idx_notified_entries_subscription ON notified_entries(feed_channel_id);
+CREATE INDEX IF NOT EXISTS idx_notified_entries_notified_at ON notified_entries(notified_at);
+"""
+
+# Get-or-create a feed and subscribe a channel to it. The fallback SELECT only sees
+# a feed that existed before this statement, so exactly one `feed` row comes back
+CREATE_FEED_SUBSCRIPTION_SQL = """
+WITH inserted AS (
+    INSERT INTO feeds (tag_id) VALUES ($1)
+    ON CONFLICT (tag_id) DO NOTHING
+    RETURNING id
+), feed AS (
+    SELECT id, TRUE AS created FROM inserted
+    UNION ALL
+    SELECT id, FALSE AS created FROM feeds WHERE tag_id = $1
+), subscription AS (
+    INSERT INTO feed_channels (feed_id, channel_id, server_id)
+    SELECT id, $2, $3 FROM feed
+    ON CONFLICT (feed_id, channel_id) DO NOTHING
+    RETURNING id
+)
+SELECT feed.id AS feed_id, feed.created AS feed_created,
+       (SELECT id FROM subscription) AS subscription_id
+FROM feed
+"""
+
+# Marks a cache miss, since None is a valid cached value for server settings
+_MISSING = object()
+
 
 class Database:
     """Database connection and operations manager."""
     
     def __init__(self):
         self.pool: Optional[asyncpg.Pool] = None
+        self._feed_cache = TTLCache(CACHE_MAX_SIZE, CACHE_TTL_SECONDS)
+        self._subscription_cache = TTLCache(CACHE_MAX_SIZE, CACHE_TTL_SECONDS)
+        self._server_settings_cache = TTLCache(CACHE_MAX_SIZE, CACHE_TTL_SECONDS)
     
     async def connect(self):
         """Create database connection pool."""
@@ -23,8 +123,11 @@ class Database:
                 user=config.DB_USER,
                 password=config.DB_PASSWORD,
                 database=config.DB_NAME,
-                min_size=2,
-                max_size=10
+                min_size=config.DB_POOL_MIN_SIZE,
+                max_size=config.DB_POOL_MAX_SIZE,
+                max_inactive_connection_lifetime=config.DB_POOL_MAX_INACTIVE_LIFETIME,
+                statement_cache_size=config.DB_STATEMENT_CACHE_SIZE,
+                init=self._init_connection
             )
             logger.info("Database connection pool created")
             await self.init_schema()
@@ -32,164 +135,199 @@ class Database:
             logger.error(f"Failed to create database pool: {e}")
             raise
     
+    @staticmethod
+    async def _init_connection(conn: asyncpg.Connection):
+        """Decode json/jsonb columns into Python objects instead of strings."""
+        for type_name in ("json", "jsonb"):
+            await conn.set_type_codec(
+                type_name,
+                encoder=json.dumps,
+                decoder=json.loads,
+                schema="pg_catalog"
+            )
+    
+    async def warm_up(self):
+        """Bring the pool back up to its minimum size before a burst of queries.
+        
+        Connections idle longer than DB_POOL_MAX_INACTIVE_LIFETIME are closed, so
+        the pool drains between polling cycles. Checking out min_size connections
+        at once reconnects them in parallel instead of one by one under load.
+        """
+        acquired: List[asyncpg.Connection] = []
+        
+        async def acquire_one():
+            acquired.append(await self.pool.acquire())
+        
+        try:
+            results = await asyncio.gather(
+                *(acquire_one() for _ in range(config.DB_POOL_MIN_SIZE)),
+                return_exceptions=True
+            )
+        finally:
+            # Release whatever was checked out, even if the warm-up was cancelled midway
+            for conn in acquired:
+                await self.pool.release(conn)
+        failures = sum(isinstance(result, BaseException) for result in results)
+        if failures:
+            logger.warning("Failed to open %s of %s pooled connection(s)", failures, len(results))
+    
     async def close(self):
         """Close database connection pool."""
         if self.pool:
             await self.pool.close()
             logger.info("Database connection pool closed")
     
+    @asynccontextmanager
+    async def acquire(self, conn: Optional[asyncpg.Connection] = None) -> AsyncIterator[asyncpg.Connection]:
+        """Use the caller's connection if given, otherwise borrow one from the pool.
+        
+        Lets callers run several queries back to back on one connection.
+        """
+        if conn is not None:
+            yield conn
+            return
+        async with self.pool.acquire() as pooled:
+            yield pooled
+    
     async def init_schema(self):
-        """Initialize database schema."""
-        async with self.pool.acquire() as conn:
-            async with conn.transaction():
-                # Create feeds table (stores tag_id, not full URL)
-                await conn.execute("""
-                    CREATE TABLE IF NOT EXISTS feeds (
-                        id SERIAL PRIMARY KEY,
-                        tag_id TEXT UNIQUE NOT NULL,
-                        last_updated TIMESTAMP,
-                        last_entry_id TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                
-                # Create feed_channels table
-                await conn.execute("""
-                    CREATE TABLE IF NOT EXISTS feed_channels (
-                        id SERIAL PRIMARY KEY,
-                        feed_id INTEGER REFERENCES feeds(id) ON DELETE CASCADE,
-                        channel_id BIGINT NOT NULL,
-                        server_id BIGINT NOT NULL,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        UNIQUE(feed_id, channel_id)
-                    )
-                """)
-                
-                # Create server_settings table
-                await conn.execute("""
-                    CREATE TABLE IF NOT EXISTS server_settings (
-                        id SERIAL PRIMARY KEY,
-                        server_id BIGINT UNIQUE NOT NULL,
-                        require_permissions BOOLEAN DEFAULT FALSE,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_by BIGINT
-                    )
-                """)
-                
-                # Create excluded_tags table (stores tag_name, not tag_url)
-                await conn.execute("""
-                    CREATE TABLE IF NOT EXISTS excluded_tags (
-                        id SERIAL PRIMARY KEY,
-                        feed_channel_id INTEGER REFERENCES feed_channels(id) ON DELETE CASCADE,
-                        tag_name TEXT NOT NULL,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        UNIQUE(feed_channel_id, tag_name)
-                    )
-                """)
-                
-                # Create notified_entries table
-                await conn.execute("""
-                    CREATE TABLE IF NOT EXISTS notified_entries (
-                        id SERIAL PRIMARY KEY,
-                        feed_channel_id INTEGER REFERENCES feed_channels(id) ON DELETE CASCADE,
-                        entry_id TEXT NOT NULL,
-                        notified_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        UNIQUE(feed_channel_id, entry_id)
-                    )
-                """)
-                
-                # Create indexes for better performance
-                await conn.execute("CREATE INDEX IF NOT EXISTS idx_feeds_tag_id ON feeds(tag_id)")
-                await conn.execute("CREATE INDEX IF NOT EXISTS idx_feed_channels_feed ON feed_channels(feed_id)")
-                await conn.execute("CREATE INDEX IF NOT EXISTS idx_feed_channels_channel ON feed_channels(channel_id)")
-                await conn.execute("CREATE INDEX IF NOT EXISTS idx_server_settings_server ON server_settings(server_id)")
-                await conn.execute("CREATE INDEX IF NOT EXISTS idx_excluded_tags_subscription ON excluded_tags(feed_channel_id)")
-                await conn.execute("CREATE INDEX IF NOT EXISTS idx_notified_entries_subscription ON notified_entries(feed_channel_id)")
-                
-                logger.info("Database schema initialized")
+        """Initialize database schema.
+        
+        The whole script goes out as one simple query, which Postgres runs in a
+        single implicit transaction and a single round trip.
+        """
+        await self.pool.execute(SCHEMA_SQL)
+        logger.info("Database schema initialized")
     
     # Feed operations
-    async def get_or_create_feed(self, tag_id: str) -> int:
-        """Get feed_id if exists by tag_id, otherwise create and return feed_id."""
-        async with self.pool.acquire() as conn:
-            # Try to get existing feed
-            feed_id = await conn.fetchval(
-                "SELECT id FROM feeds WHERE tag_id = $1",
-                tag_id
-            )
-            
-            if feed_id:
-                return feed_id
-            
-            # Create new feed
-            feed_id = await conn.fetchval(
-                "INSERT INTO feeds (tag_id) VALUES ($1) RETURNING id",
-                tag_id
-            )
-            logger.info(f"Created new feed: tag_id={tag_id} (id: {feed_id})")
-            return feed_id
+    async def get_feed_by_tag_id(self, tag_id: str) -> Optional[asyncpg.Record]:
+        """Get feed by tag_id (cached briefly). Returns None if not found."""
+        cached = self._feed_cache.get(tag_id, _MISSING)
+        if cached is not _MISSING:
+            return cached
+        
+        row = await self.pool.fetchrow(
+            "SELECT id, tag_id, last_updated, last_entry_id, created_at FROM feeds WHERE tag_id = $1",
+            tag_id
+        )
+        self._feed_cache.set(tag_id, row)
+        return row
     
-    async def get_feed_by_tag_id(self, tag_id: str) -> Optional[Dict]:
-        """Get feed by tag_id. Returns None if not found."""
-        async with self.pool.acquire() as conn:
+    async def get_feed_by_subscription_id(
+        self,
+        subscription_id: int,
+        *,
+        conn: Optional[asyncpg.Connection] = None
+    ) -> Optional[asyncpg.Record]:
+        """Get the feed a subscription points at, in one query. Returns None if not found."""
+        async with self.acquire(conn) as conn:
             row = await conn.fetchrow(
-                "SELECT id, tag_id, last_updated, last_entry_id, created_at FROM feeds WHERE tag_id = $1",
-                tag_id
+                """
+                SELECT f.id, f.tag_id, f.last_updated, f.last_entry_id, f.created_at
+                FROM feed_channels fc
+                JOIN feeds f ON fc.feed_id = f.id
+                WHERE fc.id = $1
+                """,
+                subscription_id
             )
-            if row:
-                return dict(row)
-            return None
+            return row
     
-    async def update_feed_metadata(self, feed_id: int, last_updated: datetime, last_entry_id: str):
-        """Update feed tracking metadata."""
-        async with self.pool.acquire() as conn:
-            await conn.execute(
-                "UPDATE feeds SET last_updated = $1, last_entry_id = $2 WHERE id = $3",
-                last_updated, last_entry_id, feed_id
-            )
+    async def update_feed_metadata(
+        self,
+        feed_id: int,
+        last_updated: datetime,
+        last_entry_id: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None
+    ):
+        """Update feed tracking metadata and HTTP cache validators."""
+        tag_id = await self.pool.fetchval(
+            """
+            UPDATE feeds
+            SET last_updated = $1, last_entry_id = $2, etag = $3, last_modified = $4
+            WHERE id = $5
+            RETURNING tag_id
+            """,
+            last_updated, last_entry_id, etag, last_modified, feed_id
+        )
+        self._feed_cache.invalidate(tag_id)
     
-    async def get_all_feeds(self) -> List[Dict]:
-        """Get all unique feeds for polling."""
-        async with self.pool.acquire() as conn:
-            rows = await conn.fetch(
-                "SELECT id, tag_id, last_updated, last_entry_id FROM feeds"
-            )
-            return [dict(row) for row in rows]
+    async def get_all_feeds_with_subscriptions(self) -> List[asyncpg.Record]:
+        """Get all feeds for polling, each with its subscriptions and their excluded tags.
+        
+        Each feed row has a `subscriptions` list of dicts with `subscription_id`,
+        `channel_id`, `server_id` and `excluded_tags` (a frozenset of lowercased
+        tag names), fetched in one query.
+        """
+        rows = await self.pool.fetch(
+            """
+            SELECT f.id, f.tag_id, f.last_updated, f.last_entry_id, f.etag, f.last_modified,
+                   COALESCE(
+                       (
+                           SELECT json_agg(json_build_object(
+                               'subscription_id', fc.id,
+                               'channel_id', fc.channel_id,
+                               'server_id', fc.server_id,
+                               'excluded_tags', COALESCE(
+                                   (
+                                       SELECT json_agg(et.tag_name)
+                                       FROM excluded_tags et
+                                       WHERE et.feed_channel_id = fc.id
+                                   ),
+                                   '[]'::json
+                               )
+                           ))
+                           FROM feed_channels fc
+                           WHERE fc.feed_id = f.id
+                       ),
+                       '[]'::json
+                   ) as subscriptions
+            FROM feeds f
+            """
+        )
+        for feed in rows:
+            for subscription in feed["subscriptions"]:
+                subscription["excluded_tags"] = self._lowercase_tags(subscription["excluded_tags"])
+        return rows
     
     # Feed-Channel subscription operations
-    async def create_subscription(self, feed_id: int, channel_id: int, server_id: int) -> int:
-        """Create feed-channel subscription. Returns subscription id."""
-        async with self.pool.acquire() as conn:
-            try:
-                subscription_id = await conn.fetchval(
-                    "INSERT INTO feed_channels (feed_id, channel_id, server_id) VALUES ($1, $2, $3) RETURNING id",
-                    feed_id, channel_id, server_id
-                )
-                logger.info(f"Created subscription: feed_id={feed_id}, channel_id={channel_id}")
-                return subscription_id
-            except asyncpg.UniqueViolationError:
-                # Subscription already exists
-                subscription_id = await conn.fetchval(
-                    "SELECT id FROM feed_channels WHERE feed_id = $1 AND channel_id = $2",
-                    feed_id, channel_id
-                )
-                return subscription_id
+    async def create_feed_subscription(self, tag_id: str, channel_id: int, server_id: int) -> Tuple[int, Optional[int]]:
+        """Get or create a feed and subscribe a channel to it in one statement.
+        
+        Returns (feed_id, subscription_id); subscription_id is None if the channel
+        already tracks the feed.
+        """
+        row = await self.pool.fetchrow(CREATE_FEED_SUBSCRIPTION_SQL, tag_id, channel_id, server_id)
+        if row is None:
+            # A concurrent /track inserted the feed after our snapshot; it is visible now
+            row = await self.pool.fetchrow(CREATE_FEED_SUBSCRIPTION_SQL, tag_id, channel_id, server_id)
+        feed_id, subscription_id = row["feed_id"], row["subscription_id"]
+        if row["feed_created"]:
+            self._feed_cache.invalidate(tag_id)
+            logger.info(f"Created new feed: tag_id={tag_id} (id: {feed_id})")
+        if subscription_id is not None:
+            logger.info(f"Created subscription: feed_id={feed_id}, channel_id={channel_id}")
+        return feed_id, subscription_id
     
     async def delete_subscription(self, feed_id: int, channel_id: int) -> bool:
         """Delete feed-channel subscription. Returns True if deleted."""
-        async with self.pool.acquire() as conn:
-            result = await conn.execute(
-                "DELETE FROM feed_channels WHERE feed_id = $1 AND channel_id = $2",
-                feed_id, channel_id
-            )
-            deleted = result.split()[-1] == "1"
-            if deleted:
-                logger.info(f"Deleted subscription: feed_id={feed_id}, channel_id={channel_id}")
-            return deleted
+        subscription_id = await self.pool.fetchval(
+            "DELETE FROM feed_channels WHERE feed_id = $1 AND channel_id = $2 RETURNING id",
+            feed_id, channel_id
+        )
+        deleted = subscription_id is not None
+        if deleted:
+            self._subscription_cache.invalidate(subscription_id)
+            logger.info(f"Deleted subscription: feed_id={feed_id}, channel_id={channel_id}")
+        return deleted
     
-    async def get_subscriptions_by_feed(self, feed_id: int) -> List[Dict]:
+    async def get_subscriptions_by_feed(
+        self,
+        feed_id: int,
+        *,
+        conn: Optional[asyncpg.Connection] = None
+    ) -> List[asyncpg.Record]:
         """Get all channels subscribed to a feed."""
-        async with self.pool.acquire() as conn:
+        async with self.acquire(conn) as conn:
             rows = await conn.fetch(
                 """
                 SELECT id, feed_id, channel_id, server_id, created_at
@@ -198,170 +336,222 @@ class Database:
                 """,
                 feed_id
             )
-            return [dict(row) for row in rows]
+            return rows
     
-    async def get_subscriptions_by_channel(self, channel_id: int) -> List[Dict]:
-        """Get all feeds subscribed by a channel."""
-        async with self.pool.acquire() as conn:
-            rows = await conn.fetch(
-                """
-                SELECT fc.id, fc.feed_id, fc.channel_id, fc.server_id, fc.created_at,
-                       f.tag_id, f.last_updated, f.last_entry_id
-                FROM feed_channels fc
-                JOIN feeds f ON fc.feed_id = f.id
-                WHERE fc.channel_id = $1
-                ORDER BY fc.created_at DESC
-                """,
-                channel_id
-            )
-            return [dict(row) for row in rows]
+    async def get_subscriptions_by_tag_id(self, tag_id: str) -> List[asyncpg.Record]:
+        """Get all channels subscribed to the feed with the given tag_id."""
+        return await self.pool.fetch(
+            """
+            SELECT fc.id, fc.feed_id, fc.channel_id, fc.server_id, fc.created_at
+            FROM feed_channels fc
+            JOIN feeds f ON fc.feed_id = f.id
+            WHERE f.tag_id = $1
+            """,
+            tag_id
+        )
     
-    async def subscription_exists(self, feed_id: int, channel_id: int) -> bool:
-        """Check if subscription already exists."""
-        async with self.pool.acquire() as conn:
-            exists = await conn.fetchval(
-                "SELECT EXISTS(SELECT 1 FROM feed_channels WHERE feed_id = $1 AND channel_id = $2)",
-                feed_id, channel_id
-            )
-            return exists
+    async def get_subscriptions_by_channel(self, channel_id: int) -> List[asyncpg.Record]:
+        """Get all feeds subscribed by a channel.
+        
+        Rows also carry `excluded_count` and `created_str` (created_at as YYYY-MM-DD).
+        """
+        return await self.pool.fetch(
+            """
+            SELECT fc.id, fc.feed_id, fc.channel_id, fc.server_id, fc.created_at,
+                   f.tag_id, f.last_updated, f.last_entry_id,
+                   to_char(fc.created_at, 'YYYY-MM-DD') as created_str,
+                   (
+                       SELECT COUNT(*) FROM excluded_tags et
+                       WHERE et.feed_channel_id = fc.id
+                   ) as excluded_count
+            FROM feed_channels fc
+            JOIN feeds f ON fc.feed_id = f.id
+            WHERE fc.channel_id = $1
+            ORDER BY fc.created_at DESC
+            """,
+            channel_id
+        )
     
-    async def get_subscription_by_id(self, subscription_id: int) -> Optional[Dict]:
-        """Get subscription by id."""
-        async with self.pool.acquire() as conn:
-            row = await conn.fetchrow(
-                """
-                SELECT fc.id, fc.feed_id, fc.channel_id, fc.server_id, fc.created_at,
-                       f.tag_id
-                FROM feed_channels fc
-                JOIN feeds f ON fc.feed_id = f.id
-                WHERE fc.id = $1
-                """,
-                subscription_id
-            )
-            if row:
-                return dict(row)
-            return None
+    async def count_subscriptions_by_channel(self, channel_id: int) -> int:
+        """Get the number of feeds a channel is subscribed to."""
+        return await self.pool.fetchval(
+            "SELECT COUNT(*) FROM feed_channels WHERE channel_id = $1",
+            channel_id
+        )
+    
+    async def get_subscription_by_id(self, subscription_id: int) -> Optional[asyncpg.Record]:
+        """Get subscription by id (cached briefly; missing ids are not cached)."""
+        cached = self._subscription_cache.get(subscription_id)
+        if cached is not None:
+            return cached
+        
+        row = await self.pool.fetchrow(
+            """
+            SELECT fc.id, fc.feed_id, fc.channel_id, fc.server_id, fc.created_at,
+                   f.tag_id
+            FROM feed_channels fc
+            JOIN feeds f ON fc.feed_id = f.id
+            WHERE fc.id = $1
+            """,
+            subscription_id
+        )
+        if row:
+            self._subscription_cache.set(subscription_id, row)
+        return row
+    
+    async def get_subscription_for_server(self, subscription_id: int, server_id: int) -> Optional[asyncpg.Record]:
+        """Get subscription by id only if it belongs to the given server, otherwise None."""
+        cached = self._subscription_cache.get(subscription_id)
+        if cached is not None:
+            return cached if cached["server_id"] == server_id else None
+        
+        row = await self.pool.fetchrow(
+            """
+            SELECT fc.id, fc.feed_id, fc.channel_id, fc.server_id, fc.created_at,
+                   f.tag_id
+            FROM feed_channels fc
+            JOIN feeds f ON fc.feed_id = f.id
+            WHERE fc.id = $1 AND fc.server_id = $2
+            """,
+            subscription_id, server_id
+        )
+        if row:
+            self._subscription_cache.set(subscription_id, row)
+        return row
     
     # Server settings operations
     async def get_require_permissions(self, server_id: int) -> bool:
-        """Get whether server requires permissions (default: False)."""
-        async with self.pool.acquire() as conn:
-            result = await conn.fetchval(
-                "SELECT require_permissions FROM server_settings WHERE server_id = $1",
-                server_id
-            )
-            return result if result is not None else False
+        """Get whether server requires permissions (default: False).
+        
+        Served from the cached server settings row, which writes invalidate.
+        """
+        settings = await self.get_server_settings(server_id)
+        return bool(settings and settings["require_permissions"])
     
     async def set_require_permissions(self, server_id: int, require: bool, updated_by: int):
         """Set permission requirement for a server."""
-        async with self.pool.acquire() as conn:
-            await conn.execute("""
-                INSERT INTO server_settings (server_id, require_permissions, updated_by, updated_at)
-                VALUES ($1, $2, $3, CURRENT_TIMESTAMP)
-                ON CONFLICT (server_id) 
-                DO UPDATE SET 
-                    require_permissions = $2,
-                    updated_by = $3,
-                    updated_at = CURRENT_TIMESTAMP
-            """, server_id, require, updated_by)
-            logger.info(f"Updated require_permissions for server {server_id}: {require}")
+        await self.pool.execute("""
+            INSERT INTO server_settings (server_id, require_permissions, updated_by, updated_at)
+            VALUES ($1, $2, $3, CURRENT_TIMESTAMP)
+            ON CONFLICT (server_id) 
+            DO UPDATE SET 
+                require_permissions = $2,
+                updated_by = $3,
+                updated_at = CURRENT_TIMESTAMP
+        """, server_id, require, updated_by)
+        self._server_settings_cache.invalidate(server_id)
+        logger.info(f"Updated require_permissions for server {server_id}: {require}")
     
-    async def get_server_setting(self, server_id: int, setting_name: str) -> Optional[any]:
-        """Get server setting value."""
-        async with self.pool.acquire() as conn:
-            result = await conn.fetchval(
-                f"SELECT {setting_name} FROM server_settings WHERE server_id = $1",
-                server_id
-            )
-            return result
-    
-    async def get_server_settings(self, server_id: int) -> Optional[Dict]:
-        """Get all server settings."""
-        async with self.pool.acquire() as conn:
-            row = await conn.fetchrow(
-                "SELECT server_id, require_permissions, updated_at, updated_by FROM server_settings WHERE server_id = $1",
-                server_id
-            )
-            if row:
-                return dict(row)
-            return None
+    async def get_server_settings(self, server_id: int) -> Optional[asyncpg.Record]:
+        """Get all server settings (cached briefly, including servers with no settings)."""
+        cached = self._server_settings_cache.get(server_id, _MISSING)
+        if cached is not _MISSING:
+            return cached
+        
+        row = await self.pool.fetchrow(
+            "SELECT server_id, require_permissions, updated_at, updated_by FROM server_settings WHERE server_id = $1",
+            server_id
+        )
+        self._server_settings_cache.set(server_id, row)
+        return row
     
     # Excluded tags operations (now using tag_name instead of tag_url)
     async def add_excluded_tag(self, feed_channel_id: int, tag_name: str) -> bool:
         """Add tag name to exclusion list. Returns True if added."""
-        async with self.pool.acquire() as conn:
-            try:
-                await conn.execute(
-                    "INSERT INTO excluded_tags (feed_channel_id, tag_name) VALUES ($1, $2)",
-                    feed_channel_id, tag_name
-                )
-                logger.info(f"Added excluded tag: feed_channel_id={feed_channel_id}, tag_name={tag_name}")
-                return True
-            except asyncpg.UniqueViolationError:
-                # Tag already excluded
-                return False
+        added = await self.pool.fetchval(
+            """
+            INSERT INTO excluded_tags (feed_channel_id, tag_name) VALUES ($1, $2)
+            ON CONFLICT (feed_channel_id, tag_name) DO NOTHING
+            RETURNING TRUE
+            """,
+            feed_channel_id, tag_name
+        )
+        if not added:
+            # Tag already excluded
+            return False
+        logger.info(f"Added excluded tag: feed_channel_id={feed_channel_id}, tag_name={tag_name}")
+        return True
     
     async def remove_excluded_tag(self, feed_channel_id: int, tag_name: str) -> bool:
         """Remove tag name from exclusion list. Returns True if removed."""
-        async with self.pool.acquire() as conn:
-            result = await conn.execute(
-                "DELETE FROM excluded_tags WHERE feed_channel_id = $1 AND tag_name = $2",
-                feed_channel_id, tag_name
-            )
-            deleted = result.split()[-1] == "1"
-            if deleted:
-                logger.info(f"Removed excluded tag: feed_channel_id={feed_channel_id}, tag_name={tag_name}")
-            return deleted
+        result = await self.pool.execute(
+            "DELETE FROM excluded_tags WHERE feed_channel_id = $1 AND tag_name = $2",
+            feed_channel_id, tag_name
+        )
+        deleted = result.split()[-1] == "1"
+        if deleted:
+            logger.info(f"Removed excluded tag: feed_channel_id={feed_channel_id}, tag_name={tag_name}")
+        return deleted
     
     async def get_excluded_tags(self, feed_channel_id: int) -> List[str]:
         """Get excluded tag names for a subscription."""
-        async with self.pool.acquire() as conn:
-            rows = await conn.fetch(
-                "SELECT tag_name FROM excluded_tags WHERE feed_channel_id = $1",
-                feed_channel_id
-            )
-            return [row["tag_name"] for row in rows]
+        rows = await self.pool.fetch(
+            "SELECT tag_name FROM excluded_tags WHERE feed_channel_id = $1",
+            feed_channel_id
+        )
+        return [row["tag_name"] for row in rows]
     
-    async def get_subscriptions_with_excluded_tags(self, feed_id: int) -> List[Dict]:
-        """Get all subscriptions for a feed with their excluded tags."""
-        async with self.pool.acquire() as conn:
-            rows = await conn.fetch(
-                """
-                SELECT fc.id as subscription_id, fc.channel_id, fc.server_id,
-                       COALESCE(
-                           json_agg(et.tag_name) FILTER (WHERE et.tag_name IS NOT NULL),
-                           '[]'::json
-                       ) as excluded_tags
-                FROM feed_channels fc
-                LEFT JOIN excluded_tags et ON fc.id = et.feed_channel_id
-                WHERE fc.feed_id = $1
-                GROUP BY fc.id, fc.channel_id, fc.server_id
-                """,
-                feed_id
-            )
-            return [dict(row) for row in rows]
+    @staticmethod
+    def _lowercase_tags(tag_names: List[str]) -> FrozenSet[str]:
+        """Normalize excluded tag names for case-insensitive matching."""
+        return frozenset(name.lower() for name in tag_names)
+    
+    async def get_excluded_tag_counts(self, feed_channel_ids: List[int]) -> Dict[int, int]:
+        """Get the number of excluded tags for each of several subscriptions.
+        
+        Subscriptions without exclusions are absent from the result.
+        """
+        if not feed_channel_ids:
+            return {}
+        rows = await self.pool.fetch(
+            """
+            SELECT feed_channel_id, COUNT(*) as excluded_count
+            FROM excluded_tags
+            WHERE feed_channel_id = ANY($1::int[])
+            GROUP BY feed_channel_id
+            """,
+            feed_channel_ids
+        )
+        return {row["feed_channel_id"]: row["excluded_count"] for row in rows}
     
     # Notified entries operations
-    async def is_entry_notified(self, feed_channel_id: int, entry_id: str) -> bool:
-        """Check if entry has been notified for this subscription."""
-        async with self.pool.acquire() as conn:
-            exists = await conn.fetchval(
-                "SELECT EXISTS(SELECT 1 FROM notified_entries WHERE feed_channel_id = $1 AND entry_id = $2)",
-                feed_channel_id, entry_id
-            )
-            return exists
+    async def get_notified_pairs(self, feed_channel_ids: List[int], entry_ids: List[str]) -> Set[Tuple[int, str]]:
+        """Get which (subscription, entry) pairs among the given ids have already been notified."""
+        if not feed_channel_ids or not entry_ids:
+            return set()
+        rows = await self.pool.fetch(
+            """
+            SELECT feed_channel_id, entry_id FROM notified_entries
+            WHERE feed_channel_id = ANY($1::int[]) AND entry_id = ANY($2::text[])
+            """,
+            feed_channel_ids, entry_ids
+        )
+        return {(row["feed_channel_id"], row["entry_id"]) for row in rows}
+    
+    async def record_notification_pairs(self, pairs: List[Tuple[int, str]]):
+        """Record notified (subscription, entry) pairs across subscriptions, in a single statement."""
+        if not pairs:
+            return
+        feed_channel_ids, entry_ids = zip(*pairs)
+        await self.pool.execute(
+            """
+            INSERT INTO notified_entries (feed_channel_id, entry_id)
+            SELECT * FROM unnest($1::int[], $2::text[])
+            ON CONFLICT (feed_channel_id, entry_id) DO NOTHING
+            """,
+            list(feed_channel_ids), list(entry_ids)
+        )
     
-    async def record_notification(self, feed_channel_id: int, entry_id: str):
-        """Record that an entry has been notified."""
-        async with self.pool.acquire() as conn:
-            try:
-                await conn.execute(
-                    "INSERT INTO notified_entries (feed_channel_id, entry_id) VALUES ($1, $2)",
-                    feed_channel_id, entry_id
-                )
-            except asyncpg.UniqueViolationError:
-                # Already recorded, ignore
-                pass
+    async def prune_notified(self, days: int = 30) -> int:
+        """Delete notification records older than `days` days. Returns how many were deleted."""
+        result = await self.pool.execute(
+            "DELETE FROM notified_entries WHERE notified_at < NOW() - $1 * INTERVAL '1 day'",
+            days
+        )
+        deleted = int(result.split()[-1])
+        if deleted:
+            logger.info(f"Pruned {deleted} notification record(s) older than {days} day(s)")
+        return deleted
 
 
 # Global database instance
@@ -1,34 +1,97 @@
 """RSS/Atom feed parser for AO3 feeds."""
-import feedparser
 import aiohttp
+import asyncio
 import logging
+import time
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+from io import BytesIO
 from typing import List, Dict, Optional, Set
-from datetime import datetime
+from datetime import datetime, timezone
 from html import unescape
 from urllib.parse import unquote
 import re
+import sys
+from config import config
 
 logger = logging.getLogger(__name__)
 
+# Atom namespace as it appears in ElementTree tag names
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+
+# Summary HTML patterns, compiled once at import
+# Matches: https://archiveofourown.org/tags/TagName or .../tags/TagName/works
+TAG_HREF_PATTERN = re.compile(r'href="https://archiveofourown\.org/tags/([^"/]+)')
+AUTHOR_PATTERN = re.compile(r'<p>by\s+<a[^>]*href="([^"]+)"[^>]*rel="author"[^>]*>([^<]+)</a></p>')
+LINK_TEXT_PATTERN = re.compile(r'<a[^>]*>([^<]+)</a>')
+WORDS_PATTERN = re.compile(r'Words:\s*(\d+)')
+CHAPTERS_PATTERN = re.compile(r'Chapters:\s*(\d+)/(\d+|\?)')
+LANGUAGE_PATTERN = re.compile(r'Language:\s*([^<]+)')
+SERIES_PATTERN = re.compile(r'Series:\s*<a[^>]*href="([^"]+)"[^>]*>([^<]+)</a>')
+
+# Labelled tag list items in the summary's <ul>, mapped to their metadata fields
+TAG_LIST_FIELDS = {
+    "Fandoms": "fandoms",
+    "Rating": "rating",
+    "Warnings": "warnings",
+    "Categories": "categories",
+    "Characters": "characters",
+    "Relationships": "relationships",
+    "Additional Tags": "additional_tags",
+}
+TAG_LIST_ITEM_PATTERN = re.compile(
+    r'<li[^>]*>\s*(' + "|".join(TAG_LIST_FIELDS) + r'):\s*(.*?)</li>',
+    re.DOTALL
+)
+
+
+def _entry_sort_key(entry: Dict) -> datetime:
+    """Sort key ordering entries by updated (or published) date."""
+    return entry.get("updated") or entry.get("published") or datetime.min
+
 
 class FeedParser:
     """Parser for AO3 Atom feeds."""
     
+    def __init__(self):
+        # Shared HTTP session, owned and set by the bot for its lifetime
+        self.session: Optional[aiohttp.ClientSession] = None
+        
+        # Spacing between request starts so concurrent polls stay under AO3's rate limits
+        rate = config.FEED_FETCH_RATE_PER_MINUTE
+        self._fetch_interval = 60.0 / rate if rate > 0 else 0.0
+        self._next_fetch_at = 0.0
+        self._rate_lock: Optional[asyncio.Lock] = None
+    
+    async def _wait_for_rate_limit(self):
+        """Wait until the next request to AO3 is allowed to start."""
+        if not self._fetch_interval:
+            return
+        if self._rate_lock is None:
+            self._rate_lock = asyncio.Lock()
+        async with self._rate_lock:
+            now = time.monotonic()
+            if self._next_fetch_at > now:
+                await asyncio.sleep(self._next_fetch_at - now)
+                now = self._next_fetch_at
+            self._next_fetch_at = now + self._fetch_interval
+    
     @staticmethod
     def extract_tag_names(html_content: str) -> Set[str]:
-        """Extract tag names from HTML summary content."""
+        """Extract tag names from HTML summary content.
+        
+        Names are interned, since the same tags recur across entries and polls.
+        """
         tag_names = set()
-        # Pattern to match AO3 tag URLs and extract tag names
-        # Matches: https://archiveofourown.org/tags/TagName or .../tags/TagName/works
-        pattern = r'href="https://archiveofourown\.org/tags/([^"/]+)'
-        matches = re.findall(pattern, html_content)
+        matches = TAG_HREF_PATTERN.findall(html_content)
         for match in matches:
             # URL decode the tag name
             tag_name = unquote(match)
-            tag_names.add(tag_name)
+            tag_names.add(sys.intern(tag_name))
         return tag_names
     
     @staticmethod
+    @lru_cache(maxsize=4096)
     def construct_feed_url(tag_id: str) -> str:
         """Construct feed URL from tag_id."""
         return f"https://archiveofourown.org/tags/{tag_id}/feed.atom"
@@ -66,7 +129,7 @@ class FeedParser:
         # Extract author name and link from first paragraph
         author_name = author
         author_link = None
-        author_match = re.search(r'<p>by\s+<a[^>]*href="([^"]+)"[^>]*rel="author"[^>]*>([^<]+)</a></p>', summary_html)
+        author_match = AUTHOR_PATTERN.search(summary_html)
         if author_match:
             author_link = author_match.group(1)
             author_name = author_match.group(2)
@@ -87,6 +150,8 @@ class FeedParser:
             "updated": updated_dt,
             "summary_html": summary_html,
             "tag_names": tag_names,  # Changed from tag_urls to tag_names
+            # Lowercased once here so exclusion checks per subscription don't redo it
+            "tag_names_lower": frozenset(sys.intern(name.lower()) for name in tag_names),
             **metadata
         }
     
@@ -108,36 +173,24 @@ class FeedParser:
         }
         
         # Extract word count (always extract, default to 0)
-        words_match = re.search(r'Words:\s*(\d+)', html_content)
+        words_match = WORDS_PATTERN.search(html_content)
         if words_match:
             metadata["words"] = int(words_match.group(1))
         else:
             metadata["words"] = 0
         
         # Extract chapters
-        chapters_match = re.search(r'Chapters:\s*(\d+)/(\d+|\?)', html_content)
+        chapters_match = CHAPTERS_PATTERN.search(html_content)
         if chapters_match:
             metadata["chapters"] = chapters_match.group(0)
         
         # Extract language
-        lang_match = re.search(r'Language:\s*([^<]+)', html_content)
+        lang_match = LANGUAGE_PATTERN.search(html_content)
         if lang_match:
             metadata["language"] = lang_match.group(1).strip()
         
-        # Extract rating
-        rating_match = re.search(r'Rating:\s*<a[^>]*>([^<]+)</a>', html_content)
-        if rating_match:
-            metadata["rating"] = rating_match.group(1)
-        
-        # Extract fandoms
-        fandoms_match = re.search(r'Fandoms:\s*(.*?)(?:Rating:|Warnings:|Categories:|Characters:|Relationships:|Additional Tags:|</li>)', html_content, re.DOTALL)
-        if fandoms_match:
-            fandoms_text = fandoms_match.group(1)
-            fandoms_links = re.findall(r'<a[^>]*>([^<]+)</a>', fandoms_text)
-            metadata["fandoms"] = fandoms_links
-        
         # Extract series (look for "Series:" before the <ul> tag)
-        series_match = re.search(r'Series:\s*<a[^>]*href="([^"]+)"[^>]*>([^<]+)</a>', html_content)
+        series_match = SERIES_PATTERN.search(html_content)
         if series_match:
             series_link = series_match.group(1)
             series_name = series_match.group(2)
@@ -146,109 +199,150 @@ class FeedParser:
                 series_link = f"https://archiveofourown.org{series_link}"
             metadata["series"] = {"name": series_name, "link": series_link}
         
-        # Extract warnings
-        warnings_match = re.search(r'Warnings:\s*(.*?)(?:Categories:|Characters:|Relationships:|Additional Tags:|</li>)', html_content, re.DOTALL)
-        if warnings_match:
-            warnings_text = warnings_match.group(1)
-            warnings_links = re.findall(r'<a[^>]*>([^<]+)</a>', warnings_text)
-            metadata["warnings"] = warnings_links
-        
-        # Extract categories
-        categories_match = re.search(r'Categories:\s*(.*?)(?:Characters:|Relationships:|Additional Tags:|</li>)', html_content, re.DOTALL)
-        if categories_match:
-            categories_text = categories_match.group(1)
-            categories_links = re.findall(r'<a[^>]*>([^<]+)</a>', categories_text)
-            metadata["categories"] = categories_links
-        
-        # Extract characters
-        characters_match = re.search(r'Characters:\s*(.*?)(?:Relationships:|Additional Tags:|</li>)', html_content, re.DOTALL)
-        if characters_match:
-            characters_text = characters_match.group(1)
-            characters_links = re.findall(r'<a[^>]*>([^<]+)</a>', characters_text)
-            metadata["characters"] = characters_links
-        
-        # Extract relationships
-        relationships_match = re.search(r'Relationships:\s*(.*?)(?:Additional Tags:|</li>)', html_content, re.DOTALL)
-        if relationships_match:
-            relationships_text = relationships_match.group(1)
-            relationships_links = re.findall(r'<a[^>]*>([^<]+)</a>', relationships_text)
-            metadata["relationships"] = relationships_links
-        
-        # Extract additional tags
-        tags_match = re.search(r'Additional Tags:\s*(.*?)(?:</li>|</ul>)', html_content, re.DOTALL)
-        if tags_match:
-            tags_text = tags_match.group(1)
-            tags_links = re.findall(r'<a[^>]*>([^<]+)</a>', tags_text)
-            metadata["additional_tags"] = tags_links
+        # Extract the tag lists (fandoms, rating, warnings, ...) in one pass over the <li> items
+        for label, value in TAG_LIST_ITEM_PATTERN.findall(html_content):
+            field = TAG_LIST_FIELDS[label]
+            # First occurrence wins, as with a plain search
+            if metadata[field]:
+                continue
+            # Tag names repeat across entries, so share one string per name
+            links = [sys.intern(link) for link in LINK_TEXT_PATTERN.findall(value)]
+            if field == "rating":
+                metadata["rating"] = links[0] if links else None
+            else:
+                metadata[field] = links
         
         return metadata
     
     @staticmethod
-    async def fetch_and_parse(feed_url: str) -> Optional[Dict]:
-        """Fetch and parse an Atom feed."""
+    def _parse_atom_datetime(value: Optional[str]) -> Optional[tuple]:
+        """Parse an Atom (RFC 3339) timestamp into a naive UTC time tuple."""
+        if not value:
+            return None
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(feed_url, timeout=aiohttp.ClientTimeout(total=30)) as response:
-                    if response.status != 200:
-                        logger.error(f"Failed to fetch feed {feed_url}: HTTP {response.status}")
-                        return None
-                    
-                    content = await response.text()
-                    parsed = feedparser.parse(content)
-                    
-                    if parsed.bozo:
-                        logger.warning(f"Feed parsing warning for {feed_url}: {parsed.bozo_exception}")
-                    
-                    return {
-                        "feed": parsed.feed,
-                        "entries": [FeedParser.parse_entry(entry) for entry in parsed.entries],
-                        "updated": parsed.feed.get("updated_parsed"),
-                        "title": parsed.feed.get("title", "Unknown Feed")
-                    }
-        except Exception as e:
-            logger.error(f"Error fetching feed {feed_url}: {e}")
+            dt = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+        except ValueError:
             return None
+        if dt.tzinfo is not None:
+            dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+        return dt.timetuple()
+    
+    @staticmethod
+    def _atom_entry_fields(elem: ET.Element) -> Dict:
+        """Read the raw fields of an Atom <entry> element in the shape `parse_entry` expects."""
+        fields = {
+            "id": (elem.findtext(f"{ATOM_NS}id") or "").strip(),
+            "title": elem.findtext(f"{ATOM_NS}title") or "Untitled",
+            "summary": elem.findtext(f"{ATOM_NS}summary") or "",
+            "published_parsed": FeedParser._parse_atom_datetime(elem.findtext(f"{ATOM_NS}published")),
+            "updated_parsed": FeedParser._parse_atom_datetime(elem.findtext(f"{ATOM_NS}updated")),
+        }
+        
+        # Prefer the rel="alternate" link (rel defaults to alternate in Atom)
+        for link in elem.iter(f"{ATOM_NS}link"):
+            if link.get("rel", "alternate") == "alternate":
+                fields["link"] = link.get("href", "")
+                break
+        
+        author_name = elem.findtext(f"{ATOM_NS}author/{ATOM_NS}name")
+        if author_name:
+            fields["author"] = author_name.strip()
+        
+        return fields
     
     @staticmethod
-    def filter_entries_by_tags(entries: List[Dict], excluded_tag_names: Set[str]) -> List[Dict]:
-        """Filter entries that contain any excluded tag names (case-insensitive)."""
-        if not excluded_tag_names:
-            return entries
-        
-        # Normalize excluded tag names to lowercase for case-insensitive matching
-        excluded_lower = {name.lower() for name in excluded_tag_names}
-        
-        filtered = []
-        for entry in entries:
-            entry_tag_names = entry.get("tag_names", set())
-            # Normalize entry tag names to lowercase for comparison
-            entry_tag_lower = {name.lower() for name in entry_tag_names}
-            # Check if any excluded tag name matches any entry tag name
-            if not excluded_lower.intersection(entry_tag_lower):
-                filtered.append(entry)
-        
-        return filtered
+    def parse_atom(content: bytes, feed_url: str = "") -> Dict:
+        """Stream-parse an Atom document into feed info and parsed entries.
+        
+        Every entry is parsed: document order doesn't follow `updated`, so an
+        entry revised since the last poll can sit anywhere in the feed.
+        """
+        entries = []
+        title = "Unknown Feed"
+        updated = None
+        in_entry = False
+        
+        try:
+            for event, elem in ET.iterparse(BytesIO(content), events=("start", "end")):
+                if elem.tag == f"{ATOM_NS}entry":
+                    if event == "start":
+                        in_entry = True
+                        continue
+                    in_entry = False
+                    entry = FeedParser.parse_entry(FeedParser._atom_entry_fields(elem))
+                    entries.append(entry)
+                    # Free the entry's subtree; we only need the parsed dict
+                    elem.clear()
+                elif event == "end" and not in_entry:
+                    if elem.tag == f"{ATOM_NS}title":
+                        title = elem.text or title
+                    elif elem.tag == f"{ATOM_NS}updated":
+                        updated = FeedParser._parse_atom_datetime(elem.text)
+        except ET.ParseError as e:
+            # Keep whatever was parsed before the malformed part
+            logger.warning(f"Feed parsing warning for {feed_url}: {e}")
+        
+        return {
+            "entries": entries,
+            "updated": updated,
+            "title": title
+        }
+    
+    async def fetch_and_parse(
+        self,
+        feed_url: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None
+    ) -> Optional[Dict]:
+        """Fetch and parse an Atom feed using the shared HTTP session.
+        
+        When `etag`/`last_modified` are given the request is conditional, and a
+        304 response returns `{"not_modified": True}` without parsing anything.
+        """
+        if self.session is None or self.session.closed:
+            logger.error(f"Cannot fetch feed {feed_url}: HTTP session is not open")
+            return None
+        
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        
+        try:
+            await self._wait_for_rate_limit()
+            async with self.session.get(feed_url, headers=headers) as response:
+                if response.status == 304:
+                    return {"not_modified": True}
+                
+                if response.status != 200:
+                    logger.error(f"Failed to fetch feed {feed_url}: HTTP {response.status}")
+                    return None
+                
+                content = await response.read()
+                # Parse in a worker thread so other fetches and sends keep progressing
+                parsed = await asyncio.to_thread(FeedParser.parse_atom, content, feed_url)
+                
+                return {
+                    **parsed,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified")
+                }
+        except Exception as e:
+            logger.error(f"Error fetching feed {feed_url}: {e}")
+            return None
     
     @staticmethod
     def get_new_entries(entries: List[Dict], last_entry_id: Optional[str]) -> List[Dict]:
         """Get entries that are newer than the last seen entry."""
-        if not last_entry_id:
-            # No previous entry, return all entries sorted by updated date
-            return sorted(entries, key=lambda x: x.get("updated") or x.get("published") or datetime.min, reverse=True)
-        
-        # Find the index of the last entry
-        last_index = None
-        for i, entry in enumerate(entries):
-            if entry["id"] == last_entry_id:
-                last_index = i
-                break
-        
-        if last_index is None:
-            # Last entry not found, return all entries
-            return sorted(entries, key=lambda x: x.get("updated") or x.get("published") or datetime.min, reverse=True)
+        if last_entry_id:
+            # Entries before the last seen one are newer; a single scan, run once per feed
+            for i, entry in enumerate(entries):
+                if entry["id"] == last_entry_id:
+                    return entries[:i]
         
-        # Return entries before the last one (newer entries)
-        return entries[:last_index]
+        # No previous entry, or it's no longer in the feed: return all entries sorted by updated date
+        return sorted(entries, key=_entry_sort_key, reverse=True)
 
 
 # Global parser instance